@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# bench_face_detect.py - Время и полнота поиска лиц для разных масштабов, моделей и увеличений
+# на сохранённом наборе снимков (по умолчанию - фото из faces/)
+# Пример: python3 bench_face_detect.py samples/ --scales 1.0 0.5 0.25 --models hog cnn --upsample 0 1
+#         python3 bench_face_detect.py samples/ --gallery faces  # + узнавание: samples/<имя>/*.jpg
+import os
+import time
+import json
+import argparse
+import cv2
+import numpy as np
+import face_recognition
+from facial_recognition import FaceRecognition, IMAGE_EXTENSIONS
+
+MATCH_IOU = 0.5
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+def load_samples(sources, max_side):
+    # [(путь, кадр BGR, ожидаемое имя или None)]; имя - папка снимка
+    samples = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths = sorted(os.path.join(root, name) for root, _, names in os.walk(source)
+                           for name in names if name.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            paths = [source]
+        for path in paths:
+            frame = cv2.imread(path)
+            if frame is None:
+                print(f"Cannot read {path}")
+                continue
+            scale = max_side / max(frame.shape[:2]) if max_side else 1.0
+            if scale < 1:
+                frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            rel = os.path.relpath(path, source) if os.path.isdir(source) else ""
+            expected = rel.split(os.sep)[0] if os.sep in rel else None
+            samples.append((path, frame, expected))
+    return samples
+
+def iou(a, b):
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, bottom - top) * max(0, right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return inter / max(area_a + area_b - inter, 1)
+
+def matched(reference, boxes):
+    # Сколько эталонных рамок найдено (каждая рамка засчитывается один раз)
+    free = list(boxes)
+    found = 0
+    for ref in reference:
+        scores = [iou(ref, box) for box in free]
+        if scores and max(scores) >= MATCH_IOU:
+            free.pop(int(np.argmax(scores)))
+            found += 1
+    return found
+
+def parse_reference(text):
+    model, scale, upsample = text.split(":")
+    return {"model": model, "scale": float(scale), "upsample": int(upsample)}
+
+def run_config(recognizer, samples, options, repeat):
+    detect_ms, encode_ms, boxes, names = [], [], [], []
+    for _, frame, _ in samples:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rgb, found = recognizer.detect_faces(frame, options)
+            detected = time.perf_counter()
+            encodings = face_recognition.face_encodings(rgb, found) if found else []
+            encoded = time.perf_counter()
+            detect_ms.append((detected - started) * 1000)
+            encode_ms.append((encoded - detected) * 1000)
+        boxes.append(found)
+        names.append(recognizer.matcher.match(encodings))
+    return detect_ms, encode_ms, boxes, names
+
+def main():
+    parser = argparse.ArgumentParser(description="Face detection scale/model benchmark")
+    parser.add_argument("sources", nargs="*", default=["faces"], help="image files or directories")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1.0, 0.5, 0.25])
+    parser.add_argument("--models", nargs="+", default=["hog"], choices=["hog", "cnn"])
+    parser.add_argument("--upsample", type=int, nargs="+", default=[1])
+    parser.add_argument("--reference", default="hog:1.0:1",
+                        help="model:scale:upsample whose detections count as ground truth")
+    parser.add_argument("--gallery", help="faces directory for name recall (sample folder = expected name)")
+    parser.add_argument("--max-side", type=int, default=1280, help="downscale larger samples first (0 - keep)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    samples = load_samples(args.sources, args.max_side)
+    if not samples:
+        parser.error("no sample images found")
+    recognizer = FaceRecognition(faces_dir=args.gallery or "faces")
+    if args.gallery:
+        recognizer.encode_faces()
+
+    _, _, reference, _ = run_config(recognizer, samples, parse_reference(args.reference), 1)
+    total = sum(len(boxes) for boxes in reference)
+    labelled = sum(1 for _, _, expected in samples if expected)
+    print(f"{len(samples)} samples, {total} reference faces ({args.reference})")
+    print(f"{'model':>5} {'scale':>5} {'up':>3} | {'detect p50':>10} {'p95':>8} {'encode p50':>10} | "
+          f"{'recall':>7} {'extra':>6}" + (f" {'name recall':>11}" if args.gallery else ""))
+
+    results = []
+    for model in args.models:
+        for upsample in args.upsample:
+            for scale in args.scales:
+                options = {"model": model, "scale": scale, "upsample": upsample}
+                detect_ms, encode_ms, boxes, names = run_config(recognizer, samples, options, args.repeat)
+                found = sum(matched(ref, b) for ref, b in zip(reference, boxes))
+                detections = sum(len(b) for b in boxes)
+                row = {
+                    **options,
+                    "detect_ms_p50": round(percentile(detect_ms, 50), 2),
+                    "detect_ms_p95": round(percentile(detect_ms, 95), 2),
+                    "encode_ms_p50": round(percentile(encode_ms, 50), 2),
+                    "recall": round(found / max(total, 1), 4),
+                    "extra": detections - found,
+                }
+                line = (f"{model:>5} {scale:>5} {upsample:>3} | {row['detect_ms_p50']:>10} "
+                        f"{row['detect_ms_p95']:>8} {row['encode_ms_p50']:>10} | "
+                        f"{row['recall']:>7.1%} {row['extra']:>6}")
+                if args.gallery:
+                    hits = sum(1 for (_, _, expected), n in zip(samples, names) if expected and expected in n)
+                    row["name_recall"] = round(hits / max(labelled, 1), 4)
+                    line += f" {row['name_recall']:>11.1%}"
+                results.append(row)
+                print(line)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# bench_faces.py - Время сравнения лиц с базой в зависимости от её размера (синтетические кодировки)
+# Пример: python3 bench_faces.py --gallery 10 100 1000 10000 --faces 3
+import time
+import json
+import argparse
+import numpy as np
+from face_matcher import FaceMatcher, ENCODING_SIZE
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+def make_gallery(rng, size, photos_per_person):
+    # Кодировки одного человека - шум вокруг его центра; расстояния
+    # внутри человека ~0.4, между людьми больше 1.0, как у кодировок dlib
+    people = max(1, size // photos_per_person)
+    centers = rng.normal(0, 0.09, (people, ENCODING_SIZE))
+    labels = np.arange(size) % people
+    encodings = centers[labels] + rng.normal(0, 0.025, (size, ENCODING_SIZE))
+    names = [f"person{label}" for label in labels]
+    return centers, encodings, names
+
+def make_queries(rng, centers, count, unknown_share=0.2):
+    queries, expected = [], []
+    for _ in range(count):
+        if rng.random() < unknown_share:
+            queries.append(rng.normal(0, 0.09, ENCODING_SIZE))
+            expected.append(None)
+        else:
+            person = int(rng.integers(len(centers)))
+            queries.append(centers[person] + rng.normal(0, 0.025, ENCODING_SIZE))
+            expected.append(f"person{person}")
+    return np.array(queries), expected
+
+def loop_match(known, names, encodings, tolerance):
+    # Прежний способ: face_recognition.face_distance для каждого лица по списку кодировок
+    result = []
+    for encoding in encodings:
+        distances = np.linalg.norm(np.asarray(known) - encoding, axis=1)
+        best = int(np.argmin(distances))
+        result.append(names[best] if distances[best] <= tolerance else "Unknown")
+    return result
+
+def timed(fn, frames, repeat):
+    times = []
+    outputs = []
+    for _ in range(repeat):
+        for frame in frames:
+            started = time.perf_counter()
+            out = fn(frame)
+            times.append((time.perf_counter() - started) * 1000)
+            outputs.append(out)
+    return times, outputs[:len(frames)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Known-face matching benchmark")
+    parser.add_argument("--gallery", type=int, nargs="+", default=[10, 100, 1000, 5000, 20000])
+    parser.add_argument("--photos-per-person", type=int, default=5)
+    parser.add_argument("--faces", type=int, default=3, help="faces per frame")
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.6)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    results = []
+    print(f"{'gallery':>8} {'people':>7} | {'loop ms':>9} {'batched ms':>11} {'indexed ms':>11} | "
+          f"{'batched=loop':>12} {'indexed=loop':>12}")
+    for size in args.gallery:
+        centers, encodings, names = make_gallery(rng, size, args.photos_per_person)
+        frames = [make_queries(rng, centers, args.faces)[0] for _ in range(args.frames)]
+        known = list(encodings)
+        batched = FaceMatcher(encodings, names, args.tolerance, index_threshold=float("inf"))
+        indexed = FaceMatcher(encodings, names, args.tolerance, index_threshold=0)
+
+        loop_t, loop_out = timed(lambda f: loop_match(known, names, f, args.tolerance), frames, args.repeat)
+        batch_t, batch_out = timed(batched.match, frames, args.repeat)
+        index_t, index_out = timed(indexed.match, frames, args.repeat)
+
+        faces = sum(len(f) for f in loop_out)
+        batch_agree = sum(a == b for fa, fb in zip(loop_out, batch_out) for a, b in zip(fa, fb)) / faces
+        index_agree = sum(a == b for fa, fb in zip(loop_out, index_out) for a, b in zip(fa, fb)) / faces
+        row = {
+            "gallery": size,
+            "people": len(centers),
+            "faces_per_frame": args.faces,
+            "loop_ms_p50": round(percentile(loop_t, 50), 3),
+            "batched_ms_p50": round(percentile(batch_t, 50), 3),
+            "indexed_ms_p50": round(percentile(index_t, 50), 3),
+            "batched_agreement": round(batch_agree, 4),
+            "indexed_agreement": round(index_agree, 4),
+        }
+        results.append(row)
+        print(f"{size:>8} {len(centers):>7} | {row['loop_ms_p50']:>9} {row['batched_ms_p50']:>11} "
+              f"{row['indexed_ms_p50']:>11} | {batch_agree:>12.1%} {index_agree:>12.1%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# face_matcher.py - Сравнение лиц с базой одним матричным вычислением
+import numpy as np
+
+ENCODING_SIZE = 128
+
+# Больше стольких кодировок - сначала сравниваем с центроидами людей
+INDEX_THRESHOLD = 500
+# Сколько ближайших по центроиду людей проверять точно
+SHORTLIST = 4
+
+class FaceMatcher:
+    def __init__(self, encodings, names, tolerance=0.6, index_threshold=INDEX_THRESHOLD,
+                 shortlist=SHORTLIST):
+        self.tolerance = tolerance
+        self.shortlist = shortlist
+        # Все известные кодировки - одна непрерывная матрица float32 (N, 128)
+        self.matrix = np.ascontiguousarray(np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE))
+        self.norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+        self.people = sorted(set(names))
+        person_id = {name: i for i, name in enumerate(self.people)}
+        self.labels = np.array([person_id[name] for name in names], dtype=np.int32)
+        self.indexed = len(names) > index_threshold and len(self.people) > shortlist
+        if self.indexed:
+            # Кодировки, сгруппированные по людям, и центроид каждого человека
+            order = np.argsort(self.labels, kind="stable")
+            self.matrix, self.norms, self.labels = self.matrix[order], self.norms[order], self.labels[order]
+            self.offsets = np.searchsorted(self.labels, np.arange(len(self.people) + 1))
+            self.centroids = np.ascontiguousarray(np.add.reduceat(self.matrix, self.offsets[:-1])
+                                                  / np.diff(self.offsets)[:, None])
+            self.centroid_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+
+    def __len__(self):
+        return len(self.labels)
+
+    @staticmethod
+    def distances(queries, matrix, norms):
+        # Евклидово расстояние (M, N) через |q|^2 + |k|^2 - 2 q.k: одно умножение матриц
+        q_norms = np.einsum("ij,ij->i", queries, queries)
+        d2 = q_norms[:, None] + norms[None, :] - 2.0 * (queries @ matrix.T)
+        return np.sqrt(np.maximum(d2, 0.0))
+
+    def nearest(self, queries):
+        # (индексы ближайших кодировок, расстояния) для каждого лица
+        if not self.indexed:
+            d = self.distances(queries, self.matrix, self.norms)
+            best = np.argmin(d, axis=1)
+            return best, d[np.arange(len(queries)), best]
+        dc = self.distances(queries, self.centroids, self.centroid_norms)
+        candidates = np.argpartition(dc, self.shortlist - 1, axis=1)[:, :self.shortlist]
+        best = np.empty(len(queries), dtype=np.int64)
+        best_d = np.empty(len(queries), dtype=np.float32)
+        for i, people in enumerate(candidates):
+            rows = np.concatenate([np.arange(self.offsets[p], self.offsets[p + 1]) for p in people])
+            d = self.distances(queries[i:i + 1], self.matrix[rows], self.norms[rows])[0]
+            j = int(np.argmin(d))
+            best[i], best_d[i] = rows[j], d[j]
+        return best, best_d
+
+    def match_with_distances(self, encodings, unknown="Unknown"):
+        # (имена, расстояния до ближайшей кодировки) для всех лиц кадра сразу
+        if len(encodings) == 0:
+            return [], []
+        if len(self.labels) == 0:
+            return [unknown] * len(encodings), [None] * len(encodings)
+        queries = np.ascontiguousarray(np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE))
+        best, best_d = self.nearest(queries)
+        names = [self.people[self.labels[j]] if d <= self.tolerance else unknown
+                 for j, d in zip(best, best_d)]
+        return names, [float(d) for d in best_d]
+
+    def match(self, encodings, unknown="Unknown"):
+        return self.match_with_distances(encodings, unknown)[0]
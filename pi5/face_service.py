@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# face_service.py - Общий сервис распознавания лиц: модели и кодировки загружаются один раз,
+# режимы (main.py, sec_bound.py, ...) обращаются к нему через Unix-сокет
+# Запуск: python3 face_service.py
+import os
+import sys
+import time
+import secrets
+import tempfile
+import queue
+import threading
+from multiprocessing.connection import Listener, Client, AuthenticationError
+from frame_ring import FrameRingReader
+from face_tracks import FaceTrackCache
+
+# Путь Unix-сокета или ("127.0.0.1", порт)
+FACE_SERVICE_ADDRESS = "/tmp/homepal_face.sock"
+# Ключ подключения: multiprocessing.connection распаковывает (pickle) всё, что прислал
+# клиент, поэтому ключ секретный - случайный, в файле с правами 0600 у пользователя
+FACE_SERVICE_KEY_FILE = os.path.expanduser("~/.homepal_face.key")
+# Одновременные запросы собираются в пачку: сравнение с базой - одно на пачку
+BATCH_MAX = 8
+BATCH_WAIT = 0.01
+CLIENT_RETRY = 5.0
+
+def load_authkey(path=FACE_SERVICE_KEY_FILE):
+    # Первый запущенный (сервис или клиент) создаёт ключ, остальные читают его.
+    # Ключ пишется во временный файл 0600 и появляется под своим именем уже целиком
+    # (os.link не перезаписывает): параллельный читатель не увидит пустой файл
+    if not os.path.exists(path):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".homepal_face.")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(secrets.token_hex(32).encode())
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                os.link(tmp_path, path)
+            except FileExistsError:
+                # Другой процесс успел первым - используем его ключ
+                pass
+        finally:
+            os.unlink(tmp_path)
+    if os.stat(path).st_mode & 0o077:
+        raise PermissionError(f"{path} must be readable only by its owner (chmod 600)")
+    with open(path, "rb") as f:
+        key = f.read().strip()
+    if not key:
+        raise ValueError(f"empty face service key: {path}")
+    return key
+
+class FaceService:
+    def __init__(self, address=FACE_SERVICE_ADDRESS, authkey=None,
+                 batch_max=BATCH_MAX, batch_wait=BATCH_WAIT):
+        import facial_recognition as fr
+        self.address = address
+        self.authkey = authkey or load_authkey()
+        self.batch_max = batch_max
+        self.batch_wait = batch_wait
+        self.recognizer = fr.FaceRecognition()
+        self.recognizer.encode_faces()
+        self.requests = queue.Queue()
+        # Читатели колец кадров по имени: клиент может передать (кольцо, seq) вместо кадра
+        self.readers = {}
+        self.readers_lock = threading.Lock()
+        # Кэш треков лиц на каждый ключ клиента (камера/режим)
+        self.tracks = {}
+        self.stats = {"requests": 0, "batches": 0, "frames": 0, "faces": 0, "clients": 0}
+
+    def frame_from_ring(self, ring, seq):
+        with self.readers_lock:
+            reader = self.readers.get(ring)
+            if reader is None:
+                reader = self.readers[ring] = FrameRingReader(ring)
+            item = reader.read(seq)
+            if item is None:
+                # Кольцо могли пересоздать (перезапуск режима) - подключаемся заново
+                reader.close()
+                reader = self.readers[ring] = FrameRingReader(ring)
+                item = reader.read(seq)
+        return None if item is None else item[2]
+
+    def recognizer_loop(self):
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_max:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            started = time.monotonic()
+            try:
+                results = self.recognizer.recognize_batch([frame for frame, _, _, _ in batch],
+                                                          [tracks for _, tracks, _, _ in batch],
+                                                          [options for _, _, options, _ in batch])
+                error = None
+            except Exception as e:
+                print(f"Recognition error: {e}")
+                results, error = [[] for _ in batch], str(e)
+            elapsed_ms = (time.monotonic() - started) * 1000
+            self.stats["batches"] += 1
+            self.stats["frames"] += len(batch)
+            for (_, _, _, reply), faces in zip(batch, results):
+                self.stats["faces"] += len(faces)
+                reply.put({"faces": faces, "error": error, "batch": len(batch), "ms": elapsed_ms})
+
+    def handle_client(self, conn):
+        self.stats["clients"] += 1
+        reply = queue.Queue(maxsize=1)
+        try:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    break
+                op = request.get("op")
+                if op == "ping":
+                    conn.send({"ok": True, "known": len(self.recognizer.known_face_names)})
+                    continue
+                if op == "stats":
+                    conn.send({**self.stats,
+                               "tracks": {key: t.summary() for key, t in list(self.tracks.items())}})
+                    continue
+                if op == "reload":
+                    # Новые фото в faces/ - перекодируются только они (кэш кодировок)
+                    self.recognizer.encode_faces()
+                    conn.send({"ok": True, "known": len(self.recognizer.known_face_names)})
+                    continue
+                if op != "recognize":
+                    conn.send({"error": f"unknown op: {op}"})
+                    continue
+                self.stats["requests"] += 1
+                frame = request.get("frame")
+                if frame is None and request.get("ring"):
+                    try:
+                        frame = self.frame_from_ring(request["ring"], request["seq"])
+                    except (FileNotFoundError, ValueError) as e:
+                        conn.send({"faces": [], "error": str(e)})
+                        continue
+                if frame is None:
+                    conn.send({"faces": [], "error": "no frame"})
+                    continue
+                try:
+                    # Детектор (scale, model, upsample) выбирает клиент
+                    options = self.recognizer.detection_options(request.get("detect"))
+                except (KeyError, TypeError, ValueError) as e:
+                    conn.send({"faces": [], "error": str(e)})
+                    continue
+                key = request.get("track")
+                tracks = None
+                if key:
+                    tracks = self.tracks.get(key)
+                    if tracks is None:
+                        tracks = self.tracks[key] = FaceTrackCache(**request.get("track_options", {}))
+                self.requests.put((frame, tracks, options, reply))
+                conn.send(reply.get())
+        finally:
+            self.stats["clients"] -= 1
+            conn.close()
+
+    def serve_forever(self):
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            # Сокет от прошлого запуска
+            os.unlink(self.address)
+        # Сокет сразу создаётся с правами 0600 - подключиться может только владелец
+        old_umask = os.umask(0o177)
+        try:
+            listener = Listener(self.address, authkey=self.authkey)
+        finally:
+            os.umask(old_umask)
+        threading.Thread(target=self.recognizer_loop, name="face-recognizer", daemon=True).start()
+        print(f"Face service listening on {self.address}")
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    # Например, клиент с неверным ключом
+                    print(f"Face service accept error: {e}")
+                    continue
+                threading.Thread(target=self.handle_client, args=(conn,), daemon=True).start()
+        finally:
+            listener.close()
+
+class FaceClient:
+    # Тот же интерфейс, что у FaceRecognition: encode_faces() и recognize_face(frame).
+    # Если сервис не запущен - распознавание в своём процессе, как раньше
+    # track - ключ кэша треков лиц (например, имя камеры); None - без кэша.
+    # detect - параметры детектора: {"scale": 0.25, "model": "hog", "upsample": 1}
+    def __init__(self, address=FACE_SERVICE_ADDRESS, authkey=None, fallback=True,
+                 track=None, track_options=None, detect=None):
+        self.address = address
+        self.track = track
+        self.detect = detect or {}
+        self.track_options = track_options or {}
+        self.local_tracks = {}
+        self.authkey = authkey
+        self.fallback = fallback
+        self.conn = None
+        self.local = None
+        self.last_attempt = 0.0
+        self.warned = False
+        self.lock = threading.Lock()
+
+    def connect(self):
+        if self.conn is not None:
+            return True
+        now = time.monotonic()
+        if self.last_attempt and now - self.last_attempt < CLIENT_RETRY:
+            return False
+        self.last_attempt = now
+        try:
+            if self.authkey is None:
+                self.authkey = load_authkey()
+            self.conn = Client(self.address, authkey=self.authkey)
+            self.conn.send({"op": "ping"})
+            info = self.conn.recv()
+            print(f"Connected to face service ({info.get('known', 0)} known encodings)")
+            self.warned = False
+            return True
+        except (OSError, EOFError, ValueError, AuthenticationError) as e:
+            self.conn = None
+            if not self.warned:
+                print(f"Face service not available ({e})")
+                self.warned = True
+            return False
+
+    def use_local(self):
+        if self.local is None:
+            import facial_recognition as fr
+            print("Using local face recognition")
+            self.local = fr.FaceRecognition()
+            self.local.encode_faces()
+        return self.local
+
+    def encode_faces(self):
+        # С сервисом кодировки уже загружены в нём; без него - загружаем у себя
+        if not self.connect() and self.fallback:
+            self.use_local()
+
+    def call(self, request):
+        with self.lock:
+            if self.connect():
+                try:
+                    self.conn.send(request)
+                    return self.conn.recv()
+                except (OSError, EOFError) as e:
+                    print(f"Face service connection lost: {e}")
+                    self.conn.close()
+                    self.conn = None
+            return None
+
+    def request(self, track, **fields):
+        key = track or self.track
+        if key:
+            fields.update(track=key, track_options=self.track_options)
+        if self.detect:
+            fields["detect"] = self.detect
+        return dict(op="recognize", **fields)
+
+    def recognize_local(self, frame, track=None):
+        key = track or self.track
+        tracks = None
+        if key:
+            tracks = self.local_tracks.get(key)
+            if tracks is None:
+                tracks = self.local_tracks[key] = FaceTrackCache(**self.track_options)
+        return self.use_local().recognize(frame, tracks, self.detect)
+
+    def recognize(self, frame, track=None):
+        # [(имя, (top, right, bottom, left)), ...]
+        response = self.call(self.request(track, frame=frame))
+        if response is not None and not response.get("error"):
+            return response["faces"]
+        if response is not None:
+            # Ошибка сервиса - не «лиц нет»: иначе хозяин никогда не будет узнан
+            print(f"Face service error: {response['error']}")
+        if self.fallback:
+            return self.recognize_local(frame, track)
+        if response is not None:
+            raise RuntimeError(f"face service error: {response['error']}")
+        return []
+
+    def recognize_shared(self, ring, seq, frame=None, track=None):
+        # Кадр из кольца в разделяемой памяти: по сокету идёт только (имя кольца, seq)
+        response = self.call(self.request(track, ring=ring, seq=seq))
+        if response is not None and not response.get("error"):
+            return response["faces"]
+        # Кадр уже перезаписан или сервиса нет - передаём сам кадр
+        return self.recognize(frame, track) if frame is not None else []
+
+    def recognize_face(self, frame, track=None):
+        return [name for name, _ in self.recognize(frame, track)]
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+if __name__ == "__main__":
+    address = sys.argv[1] if len(sys.argv) > 1 else FACE_SERVICE_ADDRESS
+    FaceService(address).serve_forever()
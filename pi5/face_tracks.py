@@ -0,0 +1,107 @@
+# face_tracks.py - Слежение за лицами между кадрами: имя кэшируется для трека,
+# кодировка лица считается заново только когда это действительно нужно
+import time
+import itertools
+import numpy as np
+
+class FaceTrack:
+    def __init__(self, track_id, box, now):
+        self.id = track_id
+        self.box = box
+        self.name = None
+        self.distance = None
+        self.recognized_at = float("-inf")
+        self.last_seen = now
+
+class FaceTrackCache:
+    # Повторное распознавание: новый трек, неуверенное имя (раз в retry секунд)
+    # или прошло refresh секунд с последнего распознавания
+    def __init__(self, iou_threshold=0.3, center_threshold=0.5, refresh=10.0,
+                 confident_distance=0.45, retry=1.0, max_age=3.0):
+        self.iou_threshold = iou_threshold
+        self.center_threshold = center_threshold
+        self.refresh = refresh
+        self.confident_distance = confident_distance
+        self.retry = retry
+        self.max_age = max_age
+        self.tracks = []
+        self.ids = itertools.count(1)
+        self.counters = {"faces": 0, "recognized": 0, "cached": 0, "tracks": 0}
+
+    @staticmethod
+    def _as_array(boxes):
+        # (top, right, bottom, left) -> массив (n, 4)
+        return np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+
+    def _scores(self, tracks, boxes):
+        # IoU и смещение центров (в долях размера рамки) для всех пар трек-рамка
+        a = self._as_array([t.box for t in tracks])[:, None, :]
+        b = self._as_array(boxes)[None, :, :]
+        top = np.maximum(a[..., 0], b[..., 0])
+        bottom = np.minimum(a[..., 2], b[..., 2])
+        left = np.maximum(a[..., 3], b[..., 3])
+        right = np.minimum(a[..., 1], b[..., 1])
+        inter = np.clip(bottom - top, 0, None) * np.clip(right - left, 0, None)
+        area_a = (a[..., 2] - a[..., 0]) * (a[..., 1] - a[..., 3])
+        area_b = (b[..., 2] - b[..., 0]) * (b[..., 1] - b[..., 3])
+        iou = inter / np.maximum(area_a + area_b - inter, 1e-6)
+        center_a = np.stack([(a[..., 0] + a[..., 2]) / 2, (a[..., 1] + a[..., 3]) / 2], axis=-1)
+        center_b = np.stack([(b[..., 0] + b[..., 2]) / 2, (b[..., 1] + b[..., 3]) / 2], axis=-1)
+        size = np.maximum(np.sqrt(np.maximum(area_a, 1.0)), 1.0)
+        shift = np.linalg.norm(center_a - center_b, axis=-1) / size
+        return iou, shift
+
+    def associate(self, boxes, now=None):
+        # Трек для каждой рамки: жадно по IoU, затем по близости центров; остальные - новые треки
+        now = time.time() if now is None else now
+        self.tracks = [t for t in self.tracks if now - t.last_seen <= self.max_age]
+        assigned = [None] * len(boxes)
+        if self.tracks and boxes:
+            iou, shift = self._scores(self.tracks, boxes)
+            score = np.where((iou >= self.iou_threshold) | (shift <= self.center_threshold),
+                             iou - shift, -np.inf)
+            used = set()
+            for flat in np.argsort(-score, axis=None):
+                ti, bi = np.unravel_index(flat, score.shape)
+                if not np.isfinite(score[ti, bi]):
+                    break
+                if ti in used or assigned[bi] is not None:
+                    continue
+                used.add(ti)
+                assigned[bi] = self.tracks[ti]
+        for i, box in enumerate(boxes):
+            track = assigned[i]
+            if track is None:
+                track = FaceTrack(next(self.ids), box, now)
+                self.tracks.append(track)
+                self.counters["tracks"] += 1
+                assigned[i] = track
+            track.box = box
+            track.last_seen = now
+        self.counters["faces"] += len(boxes)
+        return assigned
+
+    def needs_recognition(self, track, now=None):
+        now = time.time() if now is None else now
+        if track.name is None:
+            return True
+        age = now - track.recognized_at
+        if age >= self.refresh:
+            return True
+        uncertain = track.name == "Unknown" or (track.distance is not None and
+                                                track.distance > self.confident_distance)
+        return uncertain and age >= self.retry
+
+    def store(self, track, name, distance, now=None):
+        track.name = name
+        track.distance = distance
+        track.recognized_at = time.time() if now is None else now
+        self.counters["recognized"] += 1
+
+    def cached(self, count=1):
+        self.counters["cached"] += count
+
+    def summary(self):
+        c = self.counters
+        return {**c, "active": len(self.tracks),
+                "recognized_rate": round(c["recognized"] / max(c["faces"], 1), 3)}
@@ -0,0 +1,216 @@
+# facial_recognition.py - Распознавание лиц по фотографиям из faces/<имя>/
+import os
+import time
+import zipfile
+import tempfile
+import cv2
+import numpy as np
+import face_recognition
+from face_matcher import FaceMatcher, ENCODING_SIZE, INDEX_THRESHOLD
+
+FACES_DIR = "faces"
+# Кэш кодировок: повторно кодируются только новые или изменённые фото
+CACHE_NAME = ".encodings.npz"
+CACHE_VERSION = 1
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+TOLERANCE = 0.6
+# Лица ищутся на уменьшенной копии кадра, кодировки считаются по исходному
+FRAME_SCALE = 0.25
+# Детектор: "hog" (CPU) или "cnn" (точнее, но медленнее без GPU)
+DETECTION_MODEL = "hog"
+DETECTION_MODELS = ("hog", "cnn")
+# Сколько раз увеличивать копию для поиска мелких лиц
+UPSAMPLE = 1
+
+class FaceRecognition:
+    def __init__(self, faces_dir=FACES_DIR, cache_path=None, tolerance=TOLERANCE,
+                 index_threshold=INDEX_THRESHOLD, scale=FRAME_SCALE, model=DETECTION_MODEL,
+                 upsample=UPSAMPLE):
+        self.faces_dir = faces_dir
+        self.detection = {"scale": scale, "model": model, "upsample": upsample}
+        self.detection = self.detection_options()
+        self.cache_path = cache_path or os.path.join(faces_dir, CACHE_NAME)
+        self.tolerance = tolerance
+        self.index_threshold = index_threshold
+        self.known_face_encodings = []
+        self.known_face_names = []
+        self.matcher = FaceMatcher([], [], tolerance)
+
+    def scan_photos(self):
+        # {путь относительно faces_dir: (размер, mtime_ns, имя человека)}
+        photos = {}
+        if not os.path.isdir(self.faces_dir):
+            print(f"Faces directory not found: {self.faces_dir}")
+            return photos
+        for person in sorted(os.listdir(self.faces_dir)):
+            person_dir = os.path.join(self.faces_dir, person)
+            if person.startswith(".") or not os.path.isdir(person_dir):
+                continue
+            for name in sorted(os.listdir(person_dir)):
+                if not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                st = os.stat(os.path.join(person_dir, name))
+                photos[os.path.join(person, name)] = (st.st_size, st.st_mtime_ns, person)
+        return photos
+
+    def load_cache(self):
+        # {путь: (размер, mtime_ns, имя, кодировки (k, 128))}
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as data:
+                if int(data["version"]) != CACHE_VERSION:
+                    return {}
+                offsets = np.concatenate(([0], np.cumsum(data["counts"])))
+                encodings = data["encodings"]
+                return {
+                    str(path): (int(size), int(mtime), str(name), encodings[offsets[i]:offsets[i + 1]])
+                    for i, (path, size, mtime, name) in enumerate(
+                        zip(data["paths"], data["sizes"], data["mtimes"], data["names"]))
+                }
+        except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile) as e:
+            print(f"Face cache unreadable, rebuilding: {e}")
+            return {}
+
+    def save_cache(self, entries):
+        paths = sorted(entries)
+        encodings = [entries[p][3] for p in paths]
+        # Свой временный файл у каждого процесса: сервис, main.py и sec_bound.py
+        # могут пересобирать кэш одновременно
+        fd, tmp_path = tempfile.mkstemp(prefix=CACHE_NAME + ".", suffix=".tmp",
+                                        dir=os.path.dirname(os.path.abspath(self.cache_path)))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    version=np.array(CACHE_VERSION),
+                    paths=np.array(paths, dtype=str),
+                    sizes=np.array([entries[p][0] for p in paths], dtype=np.int64),
+                    mtimes=np.array([entries[p][1] for p in paths], dtype=np.int64),
+                    names=np.array([entries[p][2] for p in paths], dtype=str),
+                    counts=np.array([len(e) for e in encodings], dtype=np.int32),
+                    encodings=(np.concatenate(encodings) if encodings
+                               else np.empty((0, ENCODING_SIZE), dtype=np.float32)),
+                )
+            # Атомарная замена: параллельно стартующий режим не прочитает половину файла
+            os.replace(tmp_path, self.cache_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def encode_photo(self, path):
+        image = face_recognition.load_image_file(os.path.join(self.faces_dir, path))
+        encodings = face_recognition.face_encodings(image)
+        if not encodings:
+            # Фото без лица тоже кэшируется, чтобы не кодировать его при каждом старте
+            print(f"No face found in {path}")
+            return np.empty((0, ENCODING_SIZE), dtype=np.float32)
+        # На фото для регистрации - один человек
+        return np.asarray(encodings[:1], dtype=np.float32)
+
+    def encode_faces(self):
+        photos = self.scan_photos()
+        cache = self.load_cache()
+        entries = {}
+        reused = encoded = 0
+        for path, (size, mtime, person) in photos.items():
+            cached = cache.get(path)
+            if cached and cached[0] == size and cached[1] == mtime and cached[2] == person:
+                entries[path] = cached
+                reused += 1
+            else:
+                entries[path] = (size, mtime, person, self.encode_photo(path))
+                encoded += 1
+        pruned = len(set(cache) - set(photos))
+        if encoded or pruned or (not cache and entries):
+            try:
+                self.save_cache(entries)
+            except OSError as e:
+                print(f"Cannot write face cache: {e}")
+
+        self.known_face_names = []
+        blocks = []
+        for path in sorted(entries):
+            _, _, person, encodings = entries[path]
+            blocks.append(encodings)
+            self.known_face_names.extend([person] * len(encodings))
+        self.known_face_encodings = (np.concatenate(blocks) if blocks
+                                     else np.empty((0, ENCODING_SIZE), dtype=np.float32))
+        self.matcher = FaceMatcher(self.known_face_encodings, self.known_face_names,
+                                   self.tolerance, index_threshold=self.index_threshold)
+        print(f"Face encodings: {len(self.known_face_names)} from {len(photos)} photos "
+              f"({reused} cached, {encoded} encoded, {pruned} removed)")
+
+    def detection_options(self, options=None, **overrides):
+        # Параметры детектора вызывающего поверх значений по умолчанию
+        merged = dict(self.detection)
+        merged.update(options or {})
+        merged.update(overrides)
+        scale = float(merged["scale"])
+        if not 0 < scale <= 1:
+            raise ValueError(f"detection scale must be in (0, 1]: {scale}")
+        if merged["model"] not in DETECTION_MODELS:
+            raise ValueError(f"unknown detection model: {merged['model']}")
+        return {"scale": scale, "model": merged["model"], "upsample": max(0, int(merged["upsample"]))}
+
+    def detect_faces(self, frame, options=None):
+        # (RGB-кадр в исходном разрешении, рамки (top, right, bottom, left) в его координатах).
+        # Детектор работает на уменьшенной копии, рамки пересчитываются обратно
+        options = self.detection_options(options)
+        scale = options["scale"]
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        small = rgb if scale == 1 else cv2.resize(rgb, (0, 0), fx=scale, fy=scale,
+                                                   interpolation=cv2.INTER_AREA)
+        locations = face_recognition.face_locations(small, number_of_times_to_upsample=options["upsample"],
+                                                    model=options["model"])
+        height, width = frame.shape[:2]
+        boxes = [(max(0, int(top / scale)), min(width, int(right / scale)),
+                  min(height, int(bottom / scale)), max(0, int(left / scale)))
+                 for top, right, bottom, left in locations]
+        return rgb, boxes
+
+    def recognize_batch(self, frames, tracks=None, options=None):
+        # [(имя, рамка), ...] для каждого кадра; все лица всех кадров
+        # сравниваются с базой за одно вычисление.
+        # tracks - FaceTrackCache (или None) для каждого кадра: кодируются только
+        # лица новых, неуверенных или давно не проверенных треков.
+        # options - параметры детектора (scale, model, upsample) для каждого кадра или None
+        tracks = tracks or [None] * len(frames)
+        options = options or [None] * len(frames)
+        now = time.time()
+        located = []
+        encodings = []
+        for frame, cache, frame_options in zip(frames, tracks, options):
+            rgb, boxes = self.detect_faces(frame, frame_options)
+            if cache is None:
+                assigned, todo = None, list(range(len(boxes)))
+            else:
+                assigned = cache.associate(boxes, now)
+                todo = [i for i, track in enumerate(assigned) if cache.needs_recognition(track, now)]
+                cache.cached(len(boxes) - len(todo))
+            if todo:
+                # Кодировка считается по области лица в полном разрешении
+                encodings.extend(face_recognition.face_encodings(rgb, [boxes[i] for i in todo]))
+            located.append((boxes, assigned, todo))
+        names, distances = self.matcher.match_with_distances(encodings)
+
+        results = []
+        k = 0
+        for (boxes, assigned, todo), cache in zip(located, tracks):
+            frame_names = [None] * len(boxes)
+            for i in todo:
+                frame_names[i] = names[k]
+                if cache is not None:
+                    cache.store(assigned[i], names[k], distances[k], now)
+                k += 1
+            if cache is not None:
+                frame_names = [track.name for track in assigned]
+            results.append(list(zip(frame_names, boxes)))
+        return results
+
+    def recognize(self, frame, tracks=None, options=None):
+        return self.recognize_batch([frame], [tracks], [options])[0]
+
+    def recognize_face(self, frame, tracks=None, options=None):
+        return [name for name, _ in self.recognize(frame, tracks, options)]
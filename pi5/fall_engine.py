@@ -0,0 +1,174 @@
+# fall_engine.py - Детектор падения по скорости/ускорению/наклону корпуса
+# на кольцевом буфере ключевых точек (оценка на каждом кадре позы)
+from collections import deque
+import numpy as np
+
+NOSE = 0
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_HIP, RIGHT_HIP = 23, 24
+KEY_POINTS = [NOSE, LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_HIP, RIGHT_HIP]
+
+# Колонки буфера: время, затем (x, y) каждой ключевой точки
+TS = 0
+COLUMNS = 1 + 2 * len(KEY_POINTS)
+
+def slope(t, y):
+    # Наклон прямой МНК: скорость по всему интервалу, а не по паре соседних кадров
+    t = t - t.mean()
+    denom = float(np.dot(t, t))
+    if denom <= 0:
+        return 0.0
+    return float(np.dot(t, y - y.mean()) / denom)
+
+class FallEngine:
+    # Падение - три фазы подряд:
+    # 1) быстрое опускание: скорость верха корпуса (МНК за velocity_span) выше порога
+    #    не меньше sustain секунд - дрожание точек так не выглядит;
+    # 2) удар: резкое торможение (ускорение, торс/с^2) после пика скорости;
+    # 3) после падения: корпус горизонтален, плечи и бёдра опустились, человек неподвижен
+    #    still_time секунд. Сесть на стул (корпус вертикален) или нагнуться (бёдра
+    #    на месте) - не падение
+    def __init__(self, size=128, window=1.0, velocity_threshold=1.5, angle_threshold=60.0,
+                 drop_threshold=0.5, upright_angle=35.0, min_samples=3, velocity_span=0.25,
+                 sustain=0.15, impact_threshold=5.0, hip_drop=0.3, confirm=2.0,
+                 still_time=0.4, still_velocity=0.4):
+        # Скорость и падение - в длинах корпуса (плечи-бёдра), чтобы не зависеть
+        # от расстояния до камеры; угол - отклонение корпуса от вертикали в градусах
+        self.window = window
+        self.velocity_threshold = velocity_threshold
+        self.angle_threshold = angle_threshold
+        self.drop_threshold = drop_threshold
+        self.upright_angle = upright_angle
+        self.min_samples = min_samples
+        self.velocity_span = velocity_span
+        self.sustain = sustain
+        self.impact_threshold = impact_threshold
+        self.hip_drop = hip_drop
+        self.confirm = confirm
+        self.still_time = still_time
+        self.still_velocity = still_velocity
+        self.buffer = np.zeros((size, COLUMNS), dtype=np.float64)
+        self.index = 0
+        self.count = 0
+        self.latest_ts = float("-inf")
+        # С несколькими воркерами позы результаты приходят не по порядку;
+        # кадр старше последнего в буфере дал бы отрицательный интервал
+        self.out_of_order = 0
+        self.fast_since = None
+        self.still_since = None
+        # Скорости последних кадров: ускорение - тоже наклон МНК, а не разность соседних
+        self.velocities = deque(maxlen=size)
+        # Начатое быстрое опускание, ждущее удара и неподвижности
+        self.candidate = None
+        self.fallen = False
+        self.last = {"fall": False, "velocity": 0.0, "acceleration": 0.0, "angle": 0.0,
+                     "drop": 0.0, "hip_drop": 0.0}
+
+    def push(self, landmarks, ts):
+        # landmarks - массив (33, 4) из detectPose
+        row = self.buffer[self.index]
+        row[TS] = ts
+        row[1:] = np.asarray(landmarks)[KEY_POINTS, :2].ravel()
+        self.index = (self.index + 1) % len(self.buffer)
+        self.count = min(self.count + 1, len(self.buffer))
+
+    def window_rows(self, now, span):
+        if self.count < len(self.buffer):
+            rows = self.buffer[:self.count]
+        else:
+            # Кольцо в хронологическом порядке
+            rows = np.roll(self.buffer, -self.index, axis=0)
+        return rows[rows[:, TS] >= now - span]
+
+    def update(self, landmarks, ts):
+        # Возвращает True ровно один раз на падение
+        if landmarks is None or len(landmarks) == 0:
+            return False
+        if ts <= self.latest_ts:
+            self.out_of_order += 1
+            return False
+        self.latest_ts = ts
+        self.push(landmarks, ts)
+        # Опускание ищется за window до начала падения, плюс время на подтверждение
+        rows = self.window_rows(ts, self.window + self.confirm)
+        if len(rows) < self.min_samples:
+            return False
+
+        t = rows[:, TS]
+        xy = rows[:, 1:].reshape(len(rows), len(KEY_POINTS), 2)
+        shoulders = (xy[:, 1] + xy[:, 2]) / 2
+        hips = (xy[:, 3] + xy[:, 4]) / 2
+        torso = hips - shoulders
+        torso_len = np.median(np.hypot(torso[:, 0], torso[:, 1]))
+        if torso_len < 1:
+            return False
+
+        # y растёт вниз: положительная скорость - движение к полу
+        upper_y = (shoulders[:, 1] + xy[:, 0, 1]) / 2 / torso_len
+        hip_y = hips[:, 1] / torso_len
+        recent = t >= ts - self.velocity_span
+        velocity = slope(t[recent], upper_y[recent]) if recent.sum() >= self.min_samples else 0.0
+        self.velocities.append((ts, velocity))
+        while self.velocities[0][0] < ts - self.velocity_span:
+            self.velocities.popleft()
+        acceleration = 0.0
+        if len(self.velocities) >= self.min_samples:
+            vt = np.array(self.velocities)
+            acceleration = slope(vt[:, 0], vt[:, 1])
+        angle = float(np.degrees(np.arctan2(abs(torso[-1, 0]), abs(torso[-1, 1]))))
+
+        if velocity >= self.velocity_threshold:
+            self.fast_since = ts if self.fast_since is None else self.fast_since
+        else:
+            self.fast_since = None
+        if abs(velocity) <= self.still_velocity:
+            self.still_since = ts if self.still_since is None else self.still_since
+        else:
+            self.still_since = None
+
+        if (self.candidate is None and self.fast_since is not None
+                and ts - self.fast_since >= self.sustain):
+            # Точка отсчёта - самое высокое положение за window до начала опускания
+            start = self.fast_since - self.velocity_span
+            before = (t >= start - self.window) & (t <= start)
+            if not before.any():
+                before = t <= start if (t <= start).any() else t == t[0]
+            self.candidate = {"start": start, "upper": float(upper_y[before].min()),
+                              "hip": float(hip_y[before].min()), "peak": velocity, "impact": 0.0}
+
+        drop = hip_drop = 0.0
+        new_fall = False
+        c = self.candidate
+        if c is not None:
+            c["peak"] = max(c["peak"], velocity)
+            if self.fast_since is None:
+                # Торможение после пика опускания - удар о пол
+                c["impact"] = max(c["impact"], -acceleration)
+            drop = upper_y[-1] - c["upper"]
+            hip_drop = hip_y[-1] - c["hip"]
+            still = self.still_since is not None and ts - self.still_since >= self.still_time
+            if (c["impact"] >= self.impact_threshold and still and angle >= self.angle_threshold
+                    and drop >= self.drop_threshold and hip_drop >= self.hip_drop):
+                new_fall = not self.fallen
+                self.fallen = True
+                self.candidate = None
+            elif ts - c["start"] > self.confirm + self.velocity_span + self.sustain:
+                # Не подтвердилось (сел, нагнулся и выпрямился) - забываем
+                self.candidate = None
+        if self.fallen and not new_fall and angle <= self.upright_angle:
+            # Человек снова выпрямился - можно сообщать о следующем падении
+            self.fallen = False
+
+        self.last = {
+            "fall": new_fall,
+            "velocity": float(c["peak"]) if c is not None else velocity,
+            "acceleration": float(c["impact"]) if c is not None else -acceleration,
+            "angle": angle,
+            "drop": float(drop),
+            "hip_drop": float(hip_drop),
+        }
+        return new_fall
+
+    def summary(self):
+        return {**self.last, "fallen": self.fallen, "samples": self.count,
+                "out_of_order": self.out_of_order, "candidate": self.candidate is not None}
@@ -0,0 +1,105 @@
+# frame_grabber.py - Фоновое чтение потока: анализ всегда получает самый свежий кадр
+import time
+import threading
+
+class LatestFrameGrabber:
+    # open_source() возвращает объект в духе cv2.VideoCapture
+    # (MJPEGReader, FrameRingCapture, cv2.VideoCapture)
+    def __init__(self, open_source, name="camera", reconnect_delay=2.0, metrics=None):
+        self.open_source = open_source
+        # metrics - StageMetrics: этап wait - ожидание и приём кадра (grab),
+        # decode - только декодирование (retrieve); ожидание не смешивается с работой
+        self.metrics = metrics
+        self.name = name
+        self.reconnect_delay = reconnect_delay
+        self.cond = threading.Condition()
+        self.frame = None
+        self.seq = 0
+        self.ts = 0.0
+        self.info = None
+        self.grabbed = 0
+        self.skipped = 0
+        self.running = False
+        self.connected = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f"grabber-{self.name}", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+
+    def _frame_timestamp(self, source):
+        # Время съёмки, если источник его знает, иначе время получения
+        info = getattr(source, "last_info", None)
+        if info and info.get("capture_ts"):
+            return info["capture_ts"], info
+        last_ts = getattr(source, "last_ts", None)
+        if last_ts:
+            return last_ts, info
+        return time.time(), info
+
+    def _run(self):
+        while self.running:
+            try:
+                source = self.open_source()
+            except Exception as e:
+                print(f"[{self.name}] Stream open error: {e}")
+                source = None
+            if source is None or not source.isOpened():
+                print(f"[{self.name}] Stream not available, retrying...")
+                time.sleep(self.reconnect_delay)
+                continue
+            self.connected = True
+            while self.running:
+                started = time.perf_counter()
+                ret = source.grab()
+                grabbed = time.perf_counter()
+                if ret:
+                    ret, frame = source.retrieve()
+                if ret and self.metrics is not None:
+                    self.metrics.observe("wait", (grabbed - started) * 1000)
+                    self.metrics.observe("decode", (time.perf_counter() - grabbed) * 1000)
+                    self.metrics.inc("frames_read")
+                if not ret:
+                    print(f"[{self.name}] Failed to fetch frame, reconnecting...")
+                    break
+                ts, info = self._frame_timestamp(source)
+                with self.cond:
+                    self.seq += 1
+                    self.frame = frame
+                    self.ts = ts
+                    self.info = info
+                    self.grabbed += 1
+                    self.cond.notify_all()
+            self.connected = False
+            source.release()
+            if self.running:
+                time.sleep(self.reconnect_delay)
+
+    def read_latest(self, last_seq=0, timeout=5.0):
+        # (seq, frame, ts, skipped): skipped - кадры, прочитанные, но не отданные
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq > last_seq or not self.running, timeout=timeout)
+            if self.seq <= last_seq or self.frame is None:
+                return last_seq, None, None, 0
+            skipped = self.seq - last_seq - 1 if last_seq else 0
+            self.skipped += skipped
+            return self.seq, self.frame, self.ts, skipped
+
+    def stats(self):
+        with self.cond:
+            age = time.time() - self.ts if self.ts else None
+            return {
+                "grabbed": self.grabbed,
+                "skipped": self.skipped,
+                "connected": self.connected,
+                "latest_age_ms": round(age * 1000, 1) if age is not None else None,
+            }
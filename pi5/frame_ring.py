@@ -0,0 +1,232 @@
+# frame_ring.py - Кольцо сырых BGR кадров в разделяемой памяти (seqlock)
+# Копия этого файла лежит в pi_cam/frame_ring.py (камера разворачивается без pi5/):
+# изменения формата вносить в обе и повышать VERSION - читатель отвергает чужую версию
+import time
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+MAGIC = 0x52465048  # "HPFR"
+VERSION = 1
+HEADER_SIZE = 64
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "<u4"),
+    ("version", "<u4"),
+    ("slots", "<u4"),
+    ("height", "<u4"),
+    ("width", "<u4"),
+    ("channels", "<u4"),
+    ("latest", "<u8"),
+])
+
+# lock нечётный, пока писатель заполняет слот
+SLOT_DTYPE = np.dtype([
+    ("lock", "<u8"),
+    ("seq", "<u8"),
+    ("ts", "<f8"),
+    ("mono", "<f8"),
+])
+
+def _layout(slots, height, width, channels):
+    slots_offset = HEADER_SIZE
+    frames_offset = slots_offset + slots * SLOT_DTYPE.itemsize
+    frames_offset = (frames_offset + 63) // 64 * 64
+    frame_size = height * width * channels
+    return slots_offset, frames_offset, frames_offset + slots * frame_size
+
+def _map(buf, slots, height, width, channels):
+    slots_offset, frames_offset, _ = _layout(slots, height, width, channels)
+    header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=buf)[0:1]
+    slot_meta = np.ndarray((slots,), dtype=SLOT_DTYPE, buffer=buf, offset=slots_offset)
+    frames = np.ndarray((slots, height, width, channels), dtype=np.uint8,
+                        buffer=buf, offset=frames_offset)
+    return header, slot_meta, frames
+
+def _attach(name):
+    # Читатель не владеет сегментом: resource_tracker не должен удалять его
+    # при выходе читателя (Python < 3.13 не умеет track=False)
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+class FrameRingWriter:
+    def __init__(self, name, shape, slots=8):
+        height, width = shape[:2]
+        channels = shape[2] if len(shape) > 2 else 1
+        _, _, total = _layout(slots, height, width, channels)
+        try:
+            # Остаток от предыдущего запуска камеры
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=total)
+        self.slots = slots
+        self.header, self.slot_meta, self.frames = _map(self.shm.buf, slots, height, width, channels)
+        self.slot_meta[:] = 0
+        self.header["slots"] = slots
+        self.header["height"] = height
+        self.header["width"] = width
+        self.header["channels"] = channels
+        self.header["latest"] = 0
+        self.header["version"] = VERSION
+        self.header["magic"] = MAGIC
+        self.seq = 0
+
+    def write(self, frame, ts=None, mono=None):
+        self.seq += 1
+        slot = self.seq % self.slots
+        meta = self.slot_meta[slot:slot + 1]
+        meta["lock"] += 1
+        self.frames[slot].reshape(frame.shape)[...] = frame
+        meta["seq"] = self.seq
+        meta["ts"] = time.time() if ts is None else ts
+        meta["mono"] = time.monotonic() if mono is None else mono
+        meta["lock"] += 1
+        self.header["latest"] = self.seq
+        return self.seq
+
+    def is_current(self, seq):
+        # Кадр seq ещё не перезаписан
+        return 0 < seq <= self.seq and self.seq - seq < self.slots
+
+    def close(self, unlink=True):
+        self.header = self.slot_meta = self.frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # Снаружи ещё живут view на кадры; сегмент освободится вместе с ними
+            pass
+        if unlink:
+            self.shm.unlink()
+
+class FrameRingReader:
+    def __init__(self, name, wait=0.0):
+        deadline = time.monotonic() + wait
+        while True:
+            try:
+                self.shm = _attach(name)
+                break
+            except FileNotFoundError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.2)
+        header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=self.shm.buf)[0]
+        if int(header["magic"]) != MAGIC or int(header["version"]) != VERSION:
+            self.shm.close()
+            raise ValueError(f"{name}: not a frame ring")
+        self.slots = int(header["slots"])
+        self.shape = (int(header["height"]), int(header["width"]), int(header["channels"]))
+        self.header, self.slot_meta, self.frames = _map(self.shm.buf, self.slots, *self.shape)
+
+    def latest_seq(self):
+        return int(self.header["latest"][0])
+
+    def view(self, seq=None):
+        # Кадр без копирования; годен, пока is_valid(token) == True
+        if seq is None:
+            seq = self.latest_seq()
+        if seq == 0:
+            return None
+        slot = seq % self.slots
+        lock = int(self.slot_meta["lock"][slot])
+        if lock % 2 or int(self.slot_meta["seq"][slot]) != seq:
+            return None
+        ts = float(self.slot_meta["ts"][slot])
+        token = (slot, lock)
+        if not self.is_valid(token):
+            return None
+        return seq, ts, self.frames[slot], token
+
+    def is_valid(self, token):
+        slot, lock = token
+        return int(self.slot_meta["lock"][slot]) == lock
+
+    def read(self, seq=None):
+        # Согласованная копия кадра (seqlock: повтор при гонке с писателем)
+        for _ in range(3):
+            result = self.view(seq)
+            if result is None:
+                return None
+            seq, ts, frame, token = result
+            frame = frame.copy()
+            if self.is_valid(token):
+                return seq, ts, frame
+        return None
+
+    def wait_for(self, last_seq, timeout=1.0, poll=0.002):
+        deadline = time.monotonic() + timeout
+        while True:
+            seq = self.latest_seq()
+            if seq > last_seq or time.monotonic() >= deadline:
+                return seq
+            time.sleep(poll)
+
+    def close(self):
+        self.header = self.slot_meta = self.frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass
+
+class FrameRingCapture:
+    # Обёртка в духе cv2.VideoCapture для main.py / sec_bound.py.
+    # read() отдаёт view без копии: он валиден, пока камера не обойдёт
+    # кольцо (slots - 1 кадров). copy=True - для кадров, хранимых дольше.
+    def __init__(self, name, copy=False, timeout=5.0):
+        self.reader = FrameRingReader(name, wait=timeout)
+        self.copy = copy
+        self.timeout = timeout
+        self.last_seq = 0
+        self.dropped = 0
+        self.last_ts = None
+        self.pending = None
+
+    def isOpened(self):
+        return self.reader is not None
+
+    def grab(self):
+        if self.reader is None:
+            return False
+        seq = self.reader.wait_for(self.last_seq, timeout=self.timeout)
+        if seq <= self.last_seq:
+            return False
+        if self.last_seq:
+            self.dropped += seq - self.last_seq - 1
+        self.last_seq = seq
+        self.pending = seq
+        return True
+
+    def retrieve(self):
+        if self.pending is None:
+            return False, None
+        seq, self.pending = self.pending, None
+        if self.copy:
+            result = self.reader.read(seq)
+            if result is None:
+                return False, None
+            _, self.last_ts, frame = result
+            return True, frame
+        result = self.reader.view(seq)
+        if result is None:
+            return False, None
+        _, self.last_ts, frame, _ = result
+        return True, frame
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def release(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
@@ -2,19 +2,92 @@
 import cv2
 import numpy as np
 import mediapipe as mp
-import facial_recognition as fr
-from time import time
+from face_service import FaceClient
+from mjpeg_reader import MJPEGReader
+from frame_ring import FrameRingCapture, FrameRingWriter
+from frame_grabber import LatestFrameGrabber
+from stage_workers import StageWorker
+from stream_scheduler import CameraStream, FairScheduler
+from motion_gate import DetectionCascade
+from pose_control import PoseController
+from pose_roi import PoseROITracker
+from fall_engine import FallEngine
+from stage_metrics import StageMetrics
+from time import time, perf_counter
+from collections import OrderedDict
+import multiprocessing
+import queue
 import requests
 import subprocess
 import sys
 import threading
-from flask import Flask
+from flask import Flask, Response, jsonify
 
 # --- Конфигурация (заглушки) ---
 TOKEN = "YOUR_BOT_TOKEN"
 CHAT_ID = "YOUR_CHAT_ID"
 TELEGRAM_URL = f"https://api.telegram.org/bot{TOKEN}/sendMessage"
 
+stream_url = "http://192.168.1.XXX:8000/video_feed"
+# Если камера на этой же плате: сырые кадры из разделяемой памяти, без JPEG
+FRAME_SHM_NAME = ""
+# Камеры: имя, MJPEG-поток и/или кольцо в разделяемой памяти
+STREAMS = [
+    {"name": "main", "url": stream_url, "shm": FRAME_SHM_NAME},
+]
+FRAME_TIMEOUT = 10
+STATS_EVERY = 100
+POSE_LANDMARKS = 33
+
+# Поза и лица считаются в отдельных процессах; кадры им передаются
+# через кольцо в разделяемой памяти
+WORKER_SHM_NAME = "homepal_main_frames"
+WORKER_SLOTS = 8
+JOIN_WINDOW = 64
+# Общий для всех камер пул воркеров
+POSE_WORKERS = 1
+FACE_WORKERS = 1
+# Узнанное лицо не кодируется заново, пока его трек виден (не дольше стольких секунд)
+FACE_TRACK_REFRESH = 10.0
+# Поиск лиц на уменьшенной копии кадра (доля стороны), модель "hog"/"cnn" и число увеличений
+# для мелких лиц; кодировки считаются по лицам в полном разрешении
+FACE_DETECT_SCALE = 0.25
+FACE_DETECT_MODEL = "hog"
+FACE_DETECT_UPSAMPLE = 1
+# Вес потока при делении позы между камерами
+STREAM_WEIGHTS = {"person": 4.0, "motion": 2.0, "idle": 1.0}
+
+# Каскад: поза только при изменениях в кадре или недавно замеченном человеке,
+# лица - только когда поза нашла нового человека
+GATE_MIN_CHANGED = 0.003
+GATE_MOTION_HOLDOVER = 2.0
+GATE_PERSON_HOLDOVER = 5.0
+
+# Адаптивная поза: (model_complexity, масштаб) от точного к быстрому
+POSE_LEVELS = [(2, 1.0), (1, 1.0), (1, 0.75), (0, 0.75), (0, 0.5)]
+POSE_TARGET_FPS = 10.0
+POSE_MIN_DWELL = 5.0
+POSE_THERMAL_LIMIT = 75.0
+# Через столько секунд замер более точного уровня устаревает и уровень пробуется снова
+POSE_PROBE_INTERVAL = 60.0
+
+# Поза на вырезке вокруг последнего найденного человека;
+# весь кадр - раз в ROI_FULL_EVERY кадров или при потере человека
+ROI_ENABLED = True
+ROI_PADDING = 0.3
+ROI_FULL_EVERY = 30
+
+# Падение: опускание быстрее FALL_VELOCITY (длин корпуса в секунду) дольше FALL_SUSTAIN,
+# резкое торможение (FALL_IMPACT, длин корпуса/с^2), затем лежит неподвижно FALL_STILL
+# с корпусом наклонённым на FALL_ANGLE и опустившимися плечами и бёдрами
+FALL_WINDOW = 1.0
+FALL_VELOCITY = 1.5
+FALL_SUSTAIN = 0.15
+FALL_IMPACT = 5.0
+FALL_STILL = 0.4
+FALL_ANGLE = 60.0
+FALL_DROP = 0.5
+
 def send_telegram_alert(message):
     print(f"[SIMULATED] Telegram alert: {message}")
 
@@ -29,90 +102,377 @@ def switch_code():
     switch_requested = True
     return "Switching...", 200
 
-def run_server():
-    app.run(host="0.0.0.0", port=5000, debug=False, use_reloader=False)
-
-server_thread = threading.Thread(target=run_server, daemon=True)
-server_thread.start()
+# Время этапов (wait, decode, convert, pose, face, fall, alert) и счётчики
+metrics = StageMetrics()
 
-# --- Initialize modules ---
-frr = fr.FaceRecognition()
-frr.encode_faces()
+@app.route("/metrics")
+def metrics_text():
+    return Response(metrics.prometheus(), mimetype="text/plain; version=0.0.4")
 
-pose_video = mp.solutions.pose.Pose(
-    static_image_mode=False,
-    min_detection_confidence=0.7,
-    model_complexity=2
-)
+@app.route("/metrics.json")
+def metrics_json():
+    return jsonify(metrics.summary())
 
-stream_url = "http://192.168.1.XXX:8000/video_feed"
-video = cv2.VideoCapture(stream_url)
+def run_server():
+    app.run(host="0.0.0.0", port=5000, debug=False, use_reloader=False)
 
-previous_avg_shoulder_height = 0
-time1 = 0
-fall_reported = False
+def open_video(source=None):
+    source = source or STREAMS[0]
+    if source.get("shm"):
+        # Копия: кадр живёт дольше, чем камера обходит кольцо
+        return FrameRingCapture(source["shm"], copy=True)
+    return MJPEGReader(source["url"])
 
-def detectPose(frame, pose_model):
+def detectPose(frame, pose_model, out=None, timings=None):
+    # Точки позы - массив (33, 4) float32: x, y, z в пикселях кадра и visibility.
+    # out - заранее выделенный массив, заполняется на месте;
+    # timings - словарь, куда записывается время convert/pose в мс
+    started = perf_counter()
     frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    converted = perf_counter()
     results = pose_model.process(frame_rgb)
+    if timings is not None:
+        timings["convert"] = (converted - started) * 1000
+        timings["pose"] = (perf_counter() - converted) * 1000
+    if not results.pose_landmarks:
+        return None
     height, width, _ = frame.shape
-    landmarks = []
-    if results.pose_landmarks:
-        for landmark in results.pose_landmarks.landmark:
-            landmarks.append((int(landmark.x * width),
-                              int(landmark.y * height),
-                              landmark.z * width))
-        return landmarks
-    return None
-
-def detectFall(landmarks, previous_avg_shoulder_height):
-    left_shoulder_y = landmarks[11][1]
-    right_shoulder_y = landmarks[12][1]
-    avg_shoulder_y = (left_shoulder_y + right_shoulder_y) / 2
-    if previous_avg_shoulder_height == 0:
-        return False, avg_shoulder_y
-    fall_threshold = previous_avg_shoulder_height * 1.5
-    if avg_shoulder_y > fall_threshold:
-        return True, avg_shoulder_y
-    return False, avg_shoulder_y
-
-print("Starting fall and face detection...")
-
-while video.isOpened():
-    if switch_requested:
-        print("Switching to other module...")
-        video.release()
+    if out is None:
+        out = np.empty((POSE_LANDMARKS, 4), dtype=np.float32)
+    # Чтение protobuf всё равно создаёт объект и float на каждую точку, так что список
+    # из 33 кортежей (~16 мкс) не убрать; зато массив заполняется одним присваиванием
+    # и масштабируется одним умножением, без записи в numpy по точкам
+    out[:] = [(l.x, l.y, l.z, l.visibility) for l in results.pose_landmarks.landmark]
+    out[:, :3] *= (width, height, width)
+    return out
+
+# --- Обработчики для процессов-воркеров ---
+def make_pose_model(complexity):
+    return mp.solutions.pose.Pose(
+        static_image_mode=False,
+        min_detection_confidence=0.7,
+        model_complexity=complexity
+    )
+
+def make_pose_models(complexity, roi=ROI_ENABLED):
+    # MediaPipe следит за человеком между кадрами в координатах своего входа:
+    # вырезки и полные кадры идут в разные экземпляры, чтобы не сбивать друг другу слежение
+    models = {"full": make_pose_model(complexity)}
+    if roi:
+        models["roi"] = make_pose_model(complexity)
+    return models
+
+def make_pose_handler():
+    # Для каждого потока - свои модели Pose (MediaPipe следит за человеком между
+    # кадрами) и слежение ROI; сложность и масштаб подстраиваются под POSE_TARGET_FPS
+    controls = {}
+    trackers = {}
+    landmark_buffer = np.empty((POSE_LANDMARKS, 4), dtype=np.float32)
+    def handle(frame, context):
+        started = time()
+        stream = context.get("stream", "default")
+        control = controls.get(stream)
+        if control is None:
+            control = controls[stream] = PoseController(
+                make_pose_models, levels=POSE_LEVELS, target_fps=POSE_TARGET_FPS,
+                min_dwell=POSE_MIN_DWELL, thermal_limit=POSE_THERMAL_LIMIT,
+                probe_interval=POSE_PROBE_INTERVAL)
+            trackers[stream] = PoseROITracker(padding=ROI_PADDING, full_every=ROI_FULL_EVERY)
+        tracker = trackers[stream]
+        models, complexity, scale = control.current()
+        image, (off_x, off_y) = tracker.crop(frame) if ROI_ENABLED else (frame, (0, 0))
+        roi = image is not frame
+        pose_video = models["roi" if roi else "full"]
+        if scale != 1.0:
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        timings = {}
+        landmarks = detectPose(image, pose_video, out=landmark_buffer, timings=timings)
+        if landmarks is not None and (scale != 1.0 or roi):
+            # Точки из координат вырезки/уменьшенного кадра - в координаты кадра
+            landmarks[:, :3] /= scale
+            landmarks[:, 0] += off_x
+            landmarks[:, 1] += off_y
+        tracker.update(landmarks, frame.shape)
+        control.record(time() - started)
+        # Очередь сериализует результат в фоновом потоке - отдаём копию буфера
+        if landmarks is not None:
+            landmarks = landmarks.copy()
+        return {"landmarks": landmarks, "complexity": complexity, "scale": scale, "roi": roi,
+                "level_fps": round(control.achieved_fps(), 2), "timings": timings}
+    return handle
+
+def make_face_handler():
+    # Модели и кодировки - в общем сервисе (face_service.py); без него - в этом процессе
+    frr = FaceClient(track_options={"refresh": FACE_TRACK_REFRESH},
+                     detect={"scale": FACE_DETECT_SCALE, "model": FACE_DETECT_MODEL,
+                             "upsample": FACE_DETECT_UPSAMPLE})
+    frr.encode_faces()
+    def handle(frame, context):
+        # Треки лиц - свои у каждой камеры: уже узнанные лица не кодируются повторно
+        track = f"main:{context.get('stream', 'default')}"
+        if "ring" in context and "seq" in context:
+            # Сервис читает кадр из того же кольца - по сокету идёт только номер
+            faces = frr.recognize_shared(context["ring"], context["seq"], frame, track=track)
+        else:
+            faces = frr.recognize(frame, track=track)
+        return [name for name, _ in faces]
+    return handle
+
+HANDLERS = {"pose": make_pose_handler, "face": make_face_handler}
+
+# --- Детектор падения ---
+def make_fall_engine():
+    return FallEngine(window=FALL_WINDOW, velocity_threshold=FALL_VELOCITY,
+                      angle_threshold=FALL_ANGLE, drop_threshold=FALL_DROP,
+                      sustain=FALL_SUSTAIN, impact_threshold=FALL_IMPACT, still_time=FALL_STILL)
+
+def update_fall_state(stream, landmarks, ts):
+    # Каждый кадр позы попадает в буфер: падение видно через один интервал кадров
+    with metrics.timer("fall"):
+        fall = stream.fall_engine.update(landmarks, ts)
+    if fall:
+        metrics.inc("falls")
+        f = stream.fall_engine.last
+        print(f"Fall detected on {stream.name}! "
+              f"(velocity {f['velocity']:.1f} torso/s, angle {f['angle']:.0f} deg)")
+        names = stream.latest_faces["names"]
+        who = f" ({', '.join(names)})" if names else ""
+        where = f" [{stream.name}]" if len(STREAMS) > 1 else ""
+        with metrics.timer("alert"):
+            send_telegram_alert(f"Fall detected!{who}{where}")
+        metrics.inc("alerts")
+
+def make_stream(source):
+    name = source["name"]
+    # Поток постоянно вычитывает стрим; анализ берёт только последний кадр
+    grabber = LatestFrameGrabber(lambda: open_video(source), name=name, metrics=metrics).start()
+    cascade = DetectionCascade(min_changed=GATE_MIN_CHANGED,
+                               motion_holdover=GATE_MOTION_HOLDOVER,
+                               person_holdover=GATE_PERSON_HOLDOVER)
+    return CameraStream(name, grabber, cascade, make_fall_engine(), f"{WORKER_SHM_NAME}_{name}")
+
+def main():
+    server_thread = threading.Thread(target=run_server, daemon=True)
+    server_thread.start()
+
+    streams = OrderedDict((source["name"], make_stream(source)) for source in STREAMS)
+    scheduler = FairScheduler(STREAM_WEIGHTS)
+
+    # Воркеры общие для всех камер; кольцо кадров - своё у каждой камеры
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    pool_sizes = {"pose": POSE_WORKERS, "face": FACE_WORKERS}
+    workers = OrderedDict()
+    for stage, size in pool_sizes.items():
+        for index in range(size):
+            worker = StageWorker(ctx, stage, HANDLERS[stage], None, results, index=index).start()
+            workers[worker.name] = worker
+
+    print(f"Starting fall and face detection on {len(streams)} stream(s)...")
+    processed = 0
+
+    def stop_all():
+        for stream in streams.values():
+            stream.grabber.stop()
+        for worker in workers.values():
+            worker.stop()
+        for stream in streams.values():
+            if stream.ring is not None:
+                stream.ring.close()
         cv2.destroyAllWindows()
-        subprocess.Popen([sys.executable, "/path/to/other_module.py"])
-        sys.exit(0)
-
-    ret, frame = video.read()
-    if not ret:
-        print("Failed to fetch frame")
-        break
-
-    landmarks = detectPose(frame, pose_video)
-    face_names = frr.recognize_face(frame)
-
-    if face_names:
-        print("Detected faces:", face_names)
-
-    time2 = time()
-    if (time2 - time1) > 2:
-        if landmarks:
-            fall_detected, previous_avg_shoulder_height = detectFall(
-                landmarks, previous_avg_shoulder_height
-            )
-            if fall_detected and not fall_reported:
-                print("Fall detected!")
-                send_telegram_alert("Fall detected!")
-                fall_reported = True
-            elif not fall_detected:
-                fall_reported = False
-        time1 = time2
-
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
-
-video.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+
+    def idle_workers(stage):
+        return [w for w in workers.values() if w.stage == stage and w.idle()]
+
+    def write_frame(stream, frame, ts):
+        if stream.ring is None:
+            # Кольцо создаётся по размеру первого кадра камеры
+            stream.ring = FrameRingWriter(stream.ring_name, frame.shape, slots=WORKER_SLOTS)
+        ring_seq = stream.ring.write(frame, ts)
+        stream.joined[ring_seq] = {"ts": ts}
+        while len(stream.joined) > JOIN_WINDOW:
+            stream.joined.popitem(last=False)
+        return ring_seq
+
+    def submit_face(stream, worker, seq):
+        worker.submit(seq, dict(stream.context(), seq=seq))
+        stream.cascade.face_run()
+        stream.face_pending = False
+
+    def handle_result(msg):
+        worker = workers.get(msg["worker"])
+        if worker is None:
+            return
+        if msg.get("ready"):
+            worker.ready = True
+            print(f"Worker {msg['worker']} ready")
+            return
+        worker.finish()
+        if msg.get("error"):
+            metrics.inc("worker_errors")
+        stream = streams.get(msg.get("stream"))
+        seq = msg["seq"]
+        entry = stream.joined.get(seq) if stream else None
+        if entry is None or msg.get("error"):
+            return
+        latency_ms = (time() - entry["ts"]) * 1000
+        stream.stats[msg["stage"]].record(msg["process_ms"], latency_ms)
+        metrics.observe(f"{msg['stage']}_latency", latency_ms)
+        metrics.inc(f"{msg['stage']}_runs")
+        entry[msg["stage"]] = msg["result"]
+        if msg["stage"] == "pose":
+            pose = msg["result"]
+            for stage, ms in pose["timings"].items():
+                metrics.observe(stage, ms)
+            if pose["landmarks"] is not None:
+                metrics.inc("person_frames")
+            level = stream.pose_level
+            level["complexity"], level["scale"] = pose["complexity"], pose["scale"]
+            level["runs"] += 1
+            level["roi"] += pose["roi"]
+            # Падение оцениваем сразу, не дожидаясь распознавания лиц
+            update_fall_state(stream, pose["landmarks"], entry["ts"])
+            # Время кадра, а не приёма: каскад считает удержание по часам камеры
+            if stream.cascade.pose_result(pose["landmarks"] is not None, entry["ts"]):
+                stream.face_pending = True
+                stream.face_requested = time()
+                face = idle_workers("face")
+                if face and stream.ring.is_current(seq):
+                    # Кадр ещё в кольце - лица ищем на том же кадре, где поза нашла человека
+                    submit_face(stream, face[0], seq)
+        else:
+            metrics.observe("face", msg["process_ms"])
+            stream.latest_faces["seq"] = seq
+            stream.latest_faces["names"] = msg["result"] or []
+            if msg["result"]:
+                lag = entry_lag(stream, seq)
+                print(f"Detected faces on {stream.name}: {msg['result']} (face lag {lag} frames)")
+
+    def collect_gauges():
+        # Опрашивается при запросе /metrics: fps и задержка по камерам, каскад, уровень позы
+        gauges = {}
+        for name, stream in streams.items():
+            label = f'{{stream="{name}"}}'
+            grab = stream.grabber.stats()
+            g = stream.cascade.summary()
+            gauges[f"stream_connected{label}"] = grab["connected"]
+            gauges[f"frame_age_ms{label}"] = grab["latest_age_ms"]
+            gauges[f"cascade_motion_rate{label}"] = g["motion_rate"]
+            gauges[f"cascade_pose_rate{label}"] = g["pose_rate"]
+            gauges[f"pose_complexity{label}"] = stream.pose_level["complexity"]
+            gauges[f"pose_scale{label}"] = stream.pose_level["scale"]
+            for stage, stage_stats in stream.stats.items():
+                s = stage_stats.summary()
+                gauges[f"{stage}_fps{label}"] = s["fps"]
+                gauges[f"{stage}_latency_p95_ms{label}"] = s["latency_ms_p95"]
+        return gauges
+
+    metrics.add_collector(collect_gauges)
+
+    def print_stats():
+        for name, stream in streams.items():
+            age = stream.grabber.stats()["latest_age_ms"]
+            print(f"[{name}] processed {stream.processed} frames, skipped {stream.skipped} "
+                  f"(frame age {age} ms, scheduled {scheduler.picks.get(name, 0)}, {stream.priority()})")
+            for stage, stage_stats in stream.stats.items():
+                s = stage_stats.summary()
+                print(f"  {stage}: {s['fps']} fps, process p50 {s['process_ms_p50']} ms, "
+                      f"latency p50/p95 {s['latency_ms_p50']}/{s['latency_ms_p95']} ms")
+            g = stream.cascade.summary()
+            print(f"  cascade: motion {g['motion_rate']:.1%}, pose {g['pose_rate']:.1%}, "
+                  f"person {g['person_rate']:.1%} of pose runs, face {g['face_rate']:.1%}")
+            level = stream.pose_level
+            print(f"  pose level: complexity {level['complexity']}, scale {level['scale']}, "
+                  f"ROI {level['roi'] / max(level['runs'], 1):.1%} of runs")
+
+    def entry_lag(stream, seq):
+        pose_seqs = [s for s, e in stream.joined.items() if "pose" in e]
+        return max(pose_seqs) - seq if pose_seqs else 0
+
+    while True:
+        if switch_requested:
+            print("Switching to other module...")
+            stop_all()
+            subprocess.Popen([sys.executable, "/path/to/other_module.py"])
+            sys.exit(0)
+
+        try:
+            while True:
+                handle_result(results.get_nowait())
+        except queue.Empty:
+            pass
+
+        for name, worker in list(workers.items()):
+            if not worker.process.is_alive():
+                print(f"Worker {worker.name} died, restarting")
+                metrics.inc("worker_restarts")
+                index = int(name.rsplit("-", 1)[1])
+                workers[name] = StageWorker(ctx, worker.stage, HANDLERS[worker.stage], None,
+                                            results, index=index).start()
+
+        pose_free = idle_workers("pose")
+        face_free = idle_workers("face")
+        face_wanted = face_free and any(s.face_pending for s in streams.values())
+        if not (pose_free or face_wanted):
+            try:
+                handle_result(results.get(timeout=0.1))
+            except queue.Empty:
+                pass
+            continue
+
+        # Свежие кадры всех камер; каскад решает, нужна ли поза
+        latest = {}
+        for stream in streams.values():
+            item = stream.poll()
+            if item is None:
+                if not stream.stalled and time() - stream.last_frame_time > FRAME_TIMEOUT:
+                    print(f"Failed to fetch frame from {stream.name}")
+                    stream.stalled = True
+                continue
+            frame, frame_ts, skipped = item
+            latest[stream.name] = (frame, frame_ts)
+            processed += 1
+            metrics.inc("frames_processed")
+            if skipped:
+                metrics.inc("frames_skipped", skipped)
+            if processed % STATS_EVERY == 0:
+                print_stats()
+            if pose_free:
+                # Более свежий кадр заменяет ожидающий, даже если поза ему не нужна
+                run = stream.cascade.should_run_pose(frame, frame_ts)
+                stream.pending = (frame, frame_ts) if run else None
+
+        if all(stream.stalled for stream in streams.values()):
+            break
+        if not latest and not any(s.pending for s in streams.values()):
+            # Новых кадров нет - немного ждём результатов, а не крутим цикл впустую
+            try:
+                handle_result(results.get(timeout=0.02))
+            except queue.Empty:
+                pass
+            continue
+
+        # Поза: свободные воркеры делятся между камерами планировщиком
+        for worker in pose_free:
+            stream = scheduler.pick([s for s in streams.values() if s.pending])
+            if stream is None:
+                break
+            frame, frame_ts = stream.pending
+            stream.pending = None
+            ring_seq = write_frame(stream, frame, frame_ts)
+            worker.submit(ring_seq, stream.context())
+
+        # Лица: в порядке очереди запросов, на самом свежем кадре камеры
+        waiting = sorted((s for s in streams.values() if s.face_pending and s.name in latest),
+                         key=lambda s: s.face_requested)
+        for worker, stream in zip(idle_workers("face"), waiting):
+            frame, frame_ts = latest[stream.name]
+            submit_face(stream, worker, write_frame(stream, frame, frame_ts))
+
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+
+    stop_all()
+
+if __name__ == "__main__":
+    main()
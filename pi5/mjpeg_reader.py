@@ -0,0 +1,145 @@
+# mjpeg_reader.py - Чтение MJPEG потока камеры с метаданными кадров
+import time
+from collections import deque
+import cv2
+import numpy as np
+import requests
+
+class MJPEGReader:
+    # Совместим с cv2.VideoCapture (isOpened/read/grab/retrieve/release),
+    # но дополнительно отдаёт X-Frame-Seq / X-Capture-Ts каждого кадра
+    def __init__(self, url, timeout=(3, 10), latency_window=100):
+        self.url = url
+        self.timeout = timeout
+        self.response = None
+        self.raw = None
+        self.boundary = None
+        self.last_seq = 0
+        self.dropped = 0
+        self.frames = 0
+        self.latencies = deque(maxlen=latency_window)
+        self.pending = None
+        self.last_info = None
+        self.open()
+
+    def open(self):
+        self.release()
+        try:
+            self.response = requests.get(self.url, stream=True, timeout=self.timeout)
+            self.response.raise_for_status()
+        except Exception as e:
+            print(f"MJPEG stream open error: {e}")
+            self.response = None
+            return False
+        content_type = self.response.headers.get("Content-Type", "")
+        boundary = "frame"
+        for param in content_type.split(";"):
+            param = param.strip()
+            if param.startswith("boundary="):
+                boundary = param[len("boundary="):].strip('"')
+        self.boundary = b"--" + boundary.encode()
+        self.raw = self.response.raw
+        return True
+
+    def isOpened(self):
+        return self.raw is not None
+
+    def release(self):
+        if self.response is not None:
+            self.response.close()
+        self.response = None
+        self.raw = None
+
+    def _read_part(self):
+        # Пропускаем всё до строки-границы
+        while True:
+            line = self.raw.readline()
+            if not line:
+                return None
+            if line.strip() == self.boundary:
+                break
+        headers = {}
+        while True:
+            line = self.raw.readline()
+            if not line:
+                return None
+            line = line.strip()
+            if not line:
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = headers.get("content-length")
+        if length is not None:
+            data = self.raw.read(int(length))
+            if len(data) != int(length):
+                return None
+        else:
+            # Старый формат без Content-Length: читаем до конца JPEG
+            chunks = []
+            while True:
+                line = self.raw.readline()
+                if not line:
+                    return None
+                chunks.append(line)
+                if line.rstrip(b"\r\n").endswith(b"\xff\xd9"):
+                    break
+            data = b"".join(chunks).rstrip(b"\r\n")
+        return headers, data
+
+    def grab(self):
+        if self.raw is None:
+            return False
+        try:
+            part = self._read_part()
+        except Exception as e:
+            print(f"MJPEG read error: {e}")
+            part = None
+        if part is None:
+            self.release()
+            return False
+        headers, data = part
+        received = time.time()
+        info = {"seq": None, "capture_ts": None, "capture_mono": None,
+                "received": received, "latency": None, "dropped": 0, "size": len(data)}
+        if "x-frame-seq" in headers:
+            seq = int(headers["x-frame-seq"])
+            if self.last_seq and seq > self.last_seq + 1:
+                info["dropped"] = seq - self.last_seq - 1
+                self.dropped += info["dropped"]
+            self.last_seq = seq
+            info["seq"] = seq
+        if "x-capture-ts" in headers:
+            info["capture_ts"] = float(headers["x-capture-ts"])
+            # Часы камеры и Pi5 должны быть синхронизированы (NTP)
+            info["latency"] = received - info["capture_ts"]
+            self.latencies.append(info["latency"])
+        if "x-capture-monotonic" in headers:
+            info["capture_mono"] = float(headers["x-capture-monotonic"])
+        self.frames += 1
+        self.pending = data
+        self.last_info = info
+        return True
+
+    def retrieve(self):
+        if self.pending is None:
+            return False, None
+        frame = cv2.imdecode(np.frombuffer(self.pending, dtype=np.uint8), cv2.IMREAD_COLOR)
+        self.pending = None
+        return frame is not None, frame
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def read_with_info(self):
+        ret, frame = self.read()
+        return ret, frame, self.last_info
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        result = {"frames": self.frames, "dropped": self.dropped, "last_seq": self.last_seq}
+        if latencies:
+            result["latency_ms_p50"] = round(latencies[len(latencies) // 2] * 1000, 1)
+            result["latency_ms_max"] = round(latencies[-1] * 1000, 1)
+        return result
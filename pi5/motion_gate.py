@@ -0,0 +1,78 @@
+# motion_gate.py - Каскад: дешёвый детектор изменений -> поза -> распознавание лиц
+import time
+import cv2
+import numpy as np
+
+class DetectionCascade:
+    def __init__(self, size=(160, 120), pixel_threshold=25, min_changed=0.003,
+                 background_alpha=0.05, motion_holdover=2.0, person_holdover=5.0):
+        self.size = size
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.background_alpha = background_alpha
+        # Удержание: после движения/человека поза ещё какое-то время считается,
+        # чтобы каскад не «мигал» на неподвижном человеке
+        self.motion_holdover = motion_holdover
+        self.person_holdover = person_holdover
+        self.background = None
+        self.last_motion = float("-inf")
+        self.last_person = float("-inf")
+        self.last_score = 0.0
+        self.counters = {"frames": 0, "motion": 0, "pose": 0, "person": 0, "new_person": 0, "face": 0}
+
+    def motion_score(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        small = cv2.GaussianBlur(small, (5, 5), 0).astype(np.float32)
+        if self.background is None:
+            self.background = small
+            return 1.0
+        diff = cv2.absdiff(small, self.background)
+        cv2.accumulateWeighted(small, self.background, self.background_alpha)
+        return float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
+
+    def should_run_pose(self, frame, now=None):
+        now = time.time() if now is None else now
+        self.counters["frames"] += 1
+        self.last_score = self.motion_score(frame)
+        if self.last_score >= self.min_changed:
+            self.last_motion = now
+            self.counters["motion"] += 1
+        run = (now - self.last_motion <= self.motion_holdover or
+               now - self.last_person <= self.person_holdover)
+        if run:
+            self.counters["pose"] += 1
+        return run
+
+    def pose_result(self, person_found, now=None):
+        # True - человек появился после паузы: пора запускать распознавание лиц
+        now = time.time() if now is None else now
+        if not person_found:
+            return False
+        self.counters["person"] += 1
+        new_person = now - self.last_person > self.person_holdover
+        # Результаты нескольких воркеров могут прийти не по порядку кадров
+        self.last_person = max(self.last_person, now)
+        if new_person:
+            self.counters["new_person"] += 1
+        return new_person
+
+    def face_run(self):
+        self.counters["face"] += 1
+
+    def person_recent(self, now=None):
+        now = time.time() if now is None else now
+        return now - self.last_person <= self.person_holdover
+
+    def summary(self):
+        c = self.counters
+        frames = max(c["frames"], 1)
+        pose = max(c["pose"], 1)
+        return {
+            **c,
+            "motion_rate": round(c["motion"] / frames, 3),
+            "pose_rate": round(c["pose"] / frames, 3),
+            "person_rate": round(c["person"] / pose, 3),
+            "face_rate": round(c["face"] / frames, 3),
+        }
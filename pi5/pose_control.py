@@ -0,0 +1,113 @@
+# pose_control.py - Адаптивная сложность MediaPipe Pose и масштаб входа под целевой FPS
+import time
+from collections import deque
+
+# (model_complexity, масштаб входного кадра) - от самого точного к самому быстрому
+POSE_LEVELS = [(2, 1.0), (1, 1.0), (1, 0.75), (0, 0.75), (0, 0.5)]
+THERMAL_ZONE = "/sys/class/thermal/thermal_zone0/temp"
+
+def read_cpu_temperature():
+    try:
+        with open(THERMAL_ZONE) as f:
+            return int(f.read().strip()) / 1000.0
+    except (OSError, ValueError):
+        return None
+
+class PoseController:
+    # make_model(complexity) создаёт модель (или набор моделей) Pose; по одному «тёплому»
+    # набору на каждую сложность, чтобы переключение было мгновенным
+    def __init__(self, make_model, levels=POSE_LEVELS, target_fps=10.0, window=30,
+                 min_dwell=5.0, upgrade_headroom=0.7, thermal_limit=75.0, start_level=0,
+                 probe_interval=60.0):
+        self.levels = levels
+        self.target_fps = target_fps
+        self.min_dwell = min_dwell
+        self.upgrade_headroom = upgrade_headroom
+        self.thermal_limit = thermal_limit
+        self.probe_interval = probe_interval
+        self.models = {}
+        for complexity, _ in levels:
+            if complexity not in self.models:
+                self.models[complexity] = make_model(complexity)
+        self.level = start_level
+        self.latencies = deque(maxlen=window)
+        self.completions = deque(maxlen=window)
+        # Последняя измеренная задержка на каждом уровне и когда она измерена:
+        # задержка неактивного уровня не обновляется, поэтому через probe_interval
+        # она устаревает и более точный уровень пробуется снова (разовый всплеск
+        # нагрузки не должен запрещать повышение навсегда)
+        self.level_latency = {}
+        self.level_measured = {}
+        self.last_switch = float("-inf")
+        self.switches = deque(maxlen=20)
+
+    def current(self):
+        complexity, scale = self.levels[self.level]
+        return self.models[complexity], complexity, scale
+
+    def budget(self):
+        return 1.0 / self.target_fps
+
+    def record(self, latency, now=None):
+        now = time.monotonic() if now is None else now
+        self.latencies.append(latency)
+        self.completions.append(now)
+        if len(self.latencies) >= self.latencies.maxlen // 2:
+            self.level_latency[self.level] = sum(self.latencies) / len(self.latencies)
+            self.level_measured[self.level] = now
+        self._maybe_switch(now)
+
+    def achieved_fps(self):
+        if len(self.completions) < 2 or self.completions[-1] == self.completions[0]:
+            return 0.0
+        return (len(self.completions) - 1) / (self.completions[-1] - self.completions[0])
+
+    def _switch(self, level, reason, now):
+        old = self.levels[self.level]
+        self.level = level
+        self.latencies.clear()
+        self.completions.clear()
+        self.last_switch = now
+        complexity, scale = self.levels[level]
+        self.switches.append({"ts": time.time(), "from": old, "to": (complexity, scale), "reason": reason})
+        print(f"Pose level -> complexity {complexity}, scale {scale}: {reason}")
+
+    def _maybe_switch(self, now):
+        if now - self.last_switch < self.min_dwell:
+            return
+        temperature = read_cpu_temperature()
+        if temperature is not None and temperature >= self.thermal_limit:
+            if self.level < len(self.levels) - 1:
+                self._switch(self.level + 1, f"CPU {temperature:.0f}C >= {self.thermal_limit:.0f}C", now)
+            return
+        if self.level not in self.level_latency:
+            return
+        latency = self.level_latency[self.level]
+        budget = self.budget()
+        # Задержка обработки задаёт потолок FPS; фактический FPS может быть
+        # ниже из-за каскада (пустая комната), поэтому решаем по задержке
+        if latency > budget and self.level < len(self.levels) - 1:
+            self._switch(self.level + 1,
+                         f"latency {latency * 1000:.0f} ms > budget {budget * 1000:.0f} ms "
+                         f"({self.achieved_fps():.1f} fps)", now)
+            return
+        if self.level > 0:
+            better = self.level - 1
+            known = self.level_latency.get(better)
+            if known is not None and now - self.level_measured[better] >= self.probe_interval:
+                known = None
+            cool = temperature is None or temperature < self.thermal_limit - 5
+            # Повышаем, если запас большой и более точный уровень не был медленным
+            if cool and latency < budget * self.upgrade_headroom and (known is None or known < budget):
+                self._switch(better, f"latency {latency * 1000:.0f} ms leaves headroom "
+                             f"in {budget * 1000:.0f} ms budget", now)
+
+    def summary(self):
+        complexity, scale = self.levels[self.level]
+        return {
+            "complexity": complexity,
+            "scale": scale,
+            "achieved_fps": round(self.achieved_fps(), 2),
+            "latency_ms": round(self.level_latency.get(self.level, 0.0) * 1000, 1),
+            "switches": list(self.switches),
+        }
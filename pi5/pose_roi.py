@@ -0,0 +1,56 @@
+# pose_roi.py - Слежение за человеком: поза считается на вырезке вокруг прошлых точек
+class PoseROITracker:
+    def __init__(self, padding=0.3, full_every=30, min_size=96, min_visibility=0.5):
+        # padding - запас вокруг рамки точек (доля её размера),
+        # full_every - раз в сколько кадров всё равно смотреть весь кадр
+        self.padding = padding
+        self.full_every = full_every
+        self.min_size = min_size
+        self.min_visibility = min_visibility
+        self.box = None
+        self.since_full = 0
+        self.counters = {"full": 0, "roi": 0, "lost": 0}
+
+    def region(self):
+        # (x0, y0, x1, y1) для вырезки или None - нужен проход по всему кадру
+        if self.box is None or self.since_full >= self.full_every:
+            return None
+        return self.box
+
+    def crop(self, frame):
+        region = self.region()
+        if region is None:
+            self.since_full = 0
+            self.counters["full"] += 1
+            return frame, (0, 0)
+        x0, y0, x1, y1 = region
+        self.since_full += 1
+        self.counters["roi"] += 1
+        return frame[y0:y1, x0:x1], (x0, y0)
+
+    def update(self, landmarks, shape):
+        if landmarks is None:
+            if self.box is not None:
+                self.counters["lost"] += 1
+            # Потеряли человека - следующий кадр целиком
+            self.box = None
+            return
+        height, width = shape[:2]
+        # Рамка по видимым точкам; если таких мало - по всем
+        visible = landmarks[landmarks[:, 3] >= self.min_visibility]
+        points = visible if len(visible) >= 4 else landmarks
+        x0, y0 = points[:, :2].min(axis=0)
+        x1, y1 = points[:, :2].max(axis=0)
+        pad_x = max((x1 - x0) * self.padding, (self.min_size - (x1 - x0)) / 2, 0)
+        pad_y = max((y1 - y0) * self.padding, (self.min_size - (y1 - y0)) / 2, 0)
+        box = (max(0, int(x0 - pad_x)), max(0, int(y0 - pad_y)),
+               min(width, int(x1 + pad_x)), min(height, int(y1 + pad_y)))
+        if box[2] - box[0] < 2 or box[3] - box[1] < 2:
+            self.box = None
+            return
+        self.box = box
+
+    def summary(self):
+        c = self.counters
+        runs = max(c["full"] + c["roi"], 1)
+        return {**c, "roi_rate": round(c["roi"] / runs, 3), "box": self.box}
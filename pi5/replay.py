@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# replay.py - Прогон детектора падения по записанному видео без камеры, Flask и Telegram
+# Пример: python3 replay.py recordings/fall1.mp4 recordings/frames_dir --output results.jsonl
+import os
+import sys
+import time
+import json
+import argparse
+import cv2
+import numpy as np
+import main
+from motion_gate import DetectionCascade
+from pose_roi import PoseROITracker
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+def read_frames(path, default_fps):
+    # (кадр, время в записи): видеофайл или каталог с кадрами по порядку имён
+    if os.path.isdir(path):
+        names = sorted(n for n in os.listdir(path) if n.lower().endswith(IMAGE_EXTENSIONS))
+        for index, name in enumerate(names):
+            frame = cv2.imread(os.path.join(path, name))
+            if frame is not None:
+                yield frame, index / default_fps
+        return
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        print(f"Cannot open {path}")
+        return
+    fps = cap.get(cv2.CAP_PROP_FPS) or default_fps
+    index = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame, index / fps
+            index += 1
+    finally:
+        cap.release()
+
+class Replay:
+    def __init__(self, args):
+        self.args = args
+        self.face = main.make_face_handler() if args.faces or args.face_every else None
+        self.timings = {"read": [], "pose": [], "fall": [], "face": []}
+        self.detections = []
+        self.frames = 0
+
+    def run_source(self, path, out):
+        args = self.args
+        # Свежее состояние на каждую запись: результаты не зависят от порядка файлов
+        pose_models = main.make_pose_models(args.complexity, roi=args.roi)
+        buffer = np.empty((main.POSE_LANDMARKS, 4), dtype=np.float32)
+        engine = main.make_fall_engine()
+        tracker = PoseROITracker(padding=main.ROI_PADDING, full_every=main.ROI_FULL_EVERY) if args.roi else None
+        cascade = DetectionCascade(min_changed=main.GATE_MIN_CHANGED,
+                                   motion_holdover=main.GATE_MOTION_HOLDOVER,
+                                   person_holdover=main.GATE_PERSON_HOLDOVER) if args.cascade else None
+        started = time.monotonic()
+        index = 0
+        frames = read_frames(path, args.source_fps)
+        while True:
+            t0 = time.perf_counter()
+            item = next(frames, None)
+            if item is None:
+                break
+            frame, media_ts = item
+            read_ms = (time.perf_counter() - t0) * 1000
+            if args.rate:
+                # Фиксированная скорость воспроизведения вместо «как можно быстрее»
+                delay = started + index / args.rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            t1 = time.perf_counter()
+            record = {"source": path, "frame": index, "ts": round(media_ts, 3)}
+
+            run_pose = cascade.should_run_pose(frame, media_ts) if cascade else True
+            landmarks = None
+            if run_pose:
+                image, (off_x, off_y) = tracker.crop(frame) if tracker else (frame, (0, 0))
+                pose_model = pose_models["roi" if image is not frame else "full"]
+                if args.scale != 1.0:
+                    image = cv2.resize(image, None, fx=args.scale, fy=args.scale,
+                                       interpolation=cv2.INTER_AREA)
+                landmarks = main.detectPose(image, pose_model, out=buffer)
+                if landmarks is not None:
+                    landmarks[:, :3] /= args.scale
+                    landmarks[:, 0] += off_x
+                    landmarks[:, 1] += off_y
+                if tracker:
+                    tracker.update(landmarks, frame.shape)
+            t2 = time.perf_counter()
+
+            fall = engine.update(landmarks, media_ts)
+            t3 = time.perf_counter()
+
+            faces = None
+            new_person = cascade.pose_result(landmarks is not None, media_ts) if cascade else False
+            if self.face and landmarks is not None and (
+                    (args.faces and new_person) or
+                    (args.face_every and index % args.face_every == 0)):
+                faces = self.face(frame, {}) or []
+            t4 = time.perf_counter()
+
+            self.timings["read"].append(read_ms)
+            self.timings["fall"].append((t3 - t2) * 1000)
+            if run_pose:
+                self.timings["pose"].append((t2 - t1) * 1000)
+            if faces is not None:
+                self.timings["face"].append((t4 - t3) * 1000)
+
+            record.update({
+                "pose": run_pose,
+                "person": landmarks is not None,
+                "fall": fall,
+                "velocity": round(engine.last["velocity"], 3),
+                "angle": round(engine.last["angle"], 1),
+                "drop": round(engine.last["drop"], 3),
+                "faces": faces,
+                "pose_ms": round((t2 - t1) * 1000, 2),
+            })
+            if args.landmarks and landmarks is not None:
+                record["landmarks"] = np.round(landmarks, 2).tolist()
+            if out:
+                out.write(json.dumps(record) + "\n")
+            if fall:
+                self.detections.append({"source": path, "frame": index, "ts": round(media_ts, 3),
+                                        "type": "fall"})
+                print(f"Fall detected: {path} frame {index} at {media_ts:.2f} s")
+            if faces:
+                self.detections.append({"source": path, "frame": index, "ts": round(media_ts, 3),
+                                        "type": "face", "names": faces})
+            index += 1
+        self.frames += index
+        return index
+
+    def summary(self, elapsed):
+        stages = {}
+        for stage, values in self.timings.items():
+            stages[stage] = {
+                "count": len(values),
+                "p50_ms": round(percentile(values, 50), 2),
+                "p95_ms": round(percentile(values, 95), 2),
+                "p99_ms": round(percentile(values, 99), 2),
+            }
+        return {
+            "frames": self.frames,
+            "seconds": round(elapsed, 2),
+            "fps": round(self.frames / elapsed, 2) if elapsed > 0 else 0.0,
+            "stages": stages,
+            "detections": self.detections,
+        }
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Offline fall/face detection replay")
+    parser.add_argument("sources", nargs="+", help="video files or directories of frames")
+    parser.add_argument("--output", help="per-frame results as JSONL")
+    parser.add_argument("--summary", help="write the summary as JSON to this file")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="replay at this many frames per second (0 = as fast as possible)")
+    parser.add_argument("--source-fps", type=float, default=10.0,
+                        help="frame rate of frame directories (and videos without one)")
+    parser.add_argument("--complexity", type=int, default=2, choices=[0, 1, 2])
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--roi", action="store_true", help="track the person with ROI crops like main.py")
+    parser.add_argument("--cascade", action="store_true", help="gate pose with the motion cascade")
+    parser.add_argument("--faces", action="store_true", help="recognize faces when a new person appears")
+    parser.add_argument("--face-every", type=int, default=0, help="also recognize faces every N frames")
+    parser.add_argument("--landmarks", action="store_true", help="include landmarks in the JSONL output")
+    args = parser.parse_args()
+    if args.faces and not args.cascade:
+        # «Новый человек» определяется каскадом
+        args.cascade = True
+
+    replay = Replay(args)
+    out = open(args.output, "w") if args.output else None
+    started = time.monotonic()
+    try:
+        for path in args.sources:
+            count = replay.run_source(path, out)
+            print(f"{path}: {count} frames")
+    finally:
+        if out:
+            out.close()
+    summary = replay.summary(time.monotonic() - started)
+
+    print(f"Frames: {summary['frames']} in {summary['seconds']} s ({summary['fps']} fps)")
+    for stage, s in summary["stages"].items():
+        if s["count"]:
+            print(f"  {stage}: p50 {s['p50_ms']} ms, p95 {s['p95_ms']} ms, p99 {s['p99_ms']} ms ({s['count']} runs)")
+    for d in summary["detections"]:
+        names = f" {d['names']}" if d.get("names") else ""
+        print(f"  {d['type']}: {d['source']} frame {d['frame']} at {d['ts']:.2f} s{names}")
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Summary written to {args.summary}")
+    return 0 if summary["frames"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
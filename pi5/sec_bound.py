@@ -11,13 +11,17 @@ from datetime import datetime
 
 # Добавляем импорт для распознавания лиц
 sys.path.append('/home/pi3/fall_detection_DL')
-from facial_recognition import FaceRecognition
+from face_service import FaceClient
+from frame_ring import FrameRingCapture
+from mjpeg_reader import MJPEGReader
 
 # --- КОНФИГУРАЦИЯ (ЗАГЛУШКИ) ---
 PI3_IP = "192.168.1.XXX"  # Замените на реальный IP
 PI3_PORT = 8000
 PI3_URL = f"http://{PI3_IP}:{PI3_PORT}"
 STREAM_URL = "http://192.168.1.XXX:8000/video_feed"  # Замените на реальный URL
+MOTION_URL = "http://192.168.1.XXX:8000/motion"  # Метаданные движения с камеры
+FRAME_SHM_NAME = ""  # Камера на этой же плате: кадры из разделяемой памяти
 TELEGRAM_TOKEN = "YOUR_BOT_TOKEN_HERE"  # Токен Telegram бота
 CHAT_ID = "YOUR_CHAT_ID_HERE"  # ID чата Telegram
 TELEGRAM_URL = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}"
@@ -30,12 +34,27 @@ MONITORING_START_DELAY = 100
 RECOGNITION_INTERVAL = 1
 FACE_DETECTION_CONFIDENCE = 0.5
 MASTER_FACE_NAME = "master"
+# Узнанное лицо не кодируется заново, пока его трек виден (не дольше стольких секунд)
+FACE_TRACK_REFRESH = 10.0
+# Поиск лиц на уменьшенной копии кадра (доля стороны), модель "hog"/"cnn" и число увеличений
+# для мелких лиц; кодировки считаются по лицам в полном разрешении
+FACE_DETECT_SCALE = 0.25
+FACE_DETECT_MODEL = "hog"
+FACE_DETECT_UPSAMPLE = 1
+
+# Движение считает камера; кадры декодируются только при движении
+# или когда пора проверить лицо
+USE_CAMERA_MOTION = True
+MOTION_SCORE_THRESHOLD = 0.01
+MOTION_EVENT_MAX_AGE = 1.0
 
 # --- Глобальные переменные ---
 is_running = True
 face_recognizer = None
 last_recognition_time = 0
 master_detected = False
+camera_motion = {"seq": 0, "ts": 0.0, "motion_score": 0.0, "boxes": [], "received": 0.0}
+camera_motion_connected = False
 
 # --- Утилиты (заглушки) ---
 def send_telegram_message(text):
@@ -54,7 +73,9 @@ def init_face_recognition():
     global face_recognizer
     try:
         print("Initializing face recognition...")
-        face_recognizer = FaceRecognition()
+        face_recognizer = FaceClient(track="sec_bound", track_options={"refresh": FACE_TRACK_REFRESH},
+                                     detect={"scale": FACE_DETECT_SCALE, "model": FACE_DETECT_MODEL,
+                                             "upsample": FACE_DETECT_UPSAMPLE})
         face_recognizer.encode_faces()
         return True
     except Exception as e:
@@ -79,6 +100,43 @@ def check_for_face(frame):
         print(f"Face recognition error: {e}")
     return False
 
+def camera_motion_listener():
+    global camera_motion_connected
+    while is_running:
+        try:
+            # Слабое движение отсеивает камера: по сети идут только события выше порога
+            # (и keepalive), устаревание события означает "движения нет"
+            with requests.get(MOTION_URL, params={"min_score": MOTION_SCORE_THRESHOLD},
+                              stream=True, timeout=(3, 10)) as r:
+                r.raise_for_status()
+                camera_motion_connected = True
+                for line in r.iter_lines():
+                    if not is_running:
+                        break
+                    if not line.startswith(b"data: "):
+                        continue
+                    event = json.loads(line[6:])
+                    event["received"] = time.time()
+                    camera_motion.update(event)
+        except Exception as e:
+            print(f"Motion stream error: {e}")
+        camera_motion_connected = False
+        time.sleep(2)
+
+def camera_motion_detected():
+    if time.time() - camera_motion["received"] > MOTION_EVENT_MAX_AGE:
+        return False
+    return camera_motion["motion_score"] >= MOTION_SCORE_THRESHOLD
+
+def local_motion_detected(prev_frame, frame_res):
+    diff = cv2.absdiff(prev_frame, frame_res)
+    gray = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
+    blur = cv2.GaussianBlur(gray, (5, 5), 0)
+    _, thresh = cv2.threshold(blur, 30, 255, cv2.THRESH_BINARY)
+    dilated = cv2.dilate(thresh, None, iterations=2)
+    contours, _ = cv2.findContours(dilated, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    return len(contours) > 2
+
 def motion_detection_with_face_recognition(cap):
     global is_running, master_detected
     print("Starting motion detection...")
@@ -100,6 +158,23 @@ def motion_detection_with_face_recognition(cap):
     
     try:
         while is_running and cap.isOpened() and not master_detected:
+            use_camera_motion = USE_CAMERA_MOTION and camera_motion_connected
+            motion = use_camera_motion and not recording and camera_motion_detected()
+            face_due = time.time() - last_recognition_time >= RECOGNITION_INTERVAL
+            
+            if use_camera_motion and not recording and not motion and not face_due:
+                # Пакет забирается из потока, но JPEG не декодируется
+                if not cap.grab():
+                    break
+                # Пропущенные кадры не сравнивались: старый prev_frame при обрыве /motion
+                # дал бы ложное движение на локальном сравнении и попал бы в запись
+                prev_frame = None
+                frame_count += 1
+                if frame_count % 200 == 0:
+                    print("Monitoring active...")
+                time.sleep(0.05)
+                continue
+            
             ret, frame = cap.read()
             if not ret:
                 break
@@ -107,19 +182,17 @@ def motion_detection_with_face_recognition(cap):
             frame_count += 1
             frame_res = cv2.resize(frame, (640, 480))
             
-            if check_for_face(frame_res):
+            # Лицо ищется на исходном кадре камеры: детектор сам уменьшает копию,
+            # а кодировка считается по лицу в полном разрешении
+            if check_for_face(frame):
                 print("Master detected - stopping monitoring")
                 break
             
             if not recording:
-                diff = cv2.absdiff(prev_frame, frame_res)
-                gray = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
-                blur = cv2.GaussianBlur(gray, (5, 5), 0)
-                _, thresh = cv2.threshold(blur, 30, 255, cv2.THRESH_BINARY)
-                dilated = cv2.dilate(thresh, None, iterations=2)
-                contours, _ = cv2.findContours(dilated, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+                if not use_camera_motion:
+                    motion = prev_frame is not None and local_motion_detected(prev_frame, frame_res)
                 
-                if len(contours) > 2:
+                if motion:
                     print("Motion detected! Starting recording...")
                     send_telegram_message("Motion detected!")
                     
@@ -131,13 +204,13 @@ def motion_detection_with_face_recognition(cap):
                     out = cv2.VideoWriter(video_path, fourcc, 15.0, (640, 480))
                     recording = True
                     start_rec_time = time.time()
-                    out.write(prev_frame)
+                    out.write(prev_frame if prev_frame is not None else frame_res)
             else:
                 out.write(frame_res)
                 elapsed = time.time() - start_rec_time
                 
                 if elapsed % 2 < RECOGNITION_INTERVAL:
-                    if check_for_face(frame_res):
+                    if check_for_face(frame):
                         print("Master detected - stopping recording")
                         break
                 
@@ -205,7 +278,16 @@ def main():
     send_telegram_message("Security system fully activated.")
     
     print("Connecting to video stream...")
-    cap = cv2.VideoCapture(STREAM_URL)
+    if FRAME_SHM_NAME:
+        try:
+            # Кадр записывается в видео и хранится как prev_frame - нужна копия
+            cap = FrameRingCapture(FRAME_SHM_NAME, copy=True)
+        except Exception as e:
+            print(f"Shared memory frames unavailable: {e}")
+            cap = MJPEGReader(STREAM_URL)
+    else:
+        # MJPEGReader.grab только читает байты кадра; cv2.VideoCapture.grab декодирует его
+        cap = MJPEGReader(STREAM_URL)
     
     if not cap.isOpened():
         print("Failed to open video stream")
@@ -214,6 +296,8 @@ def main():
         return
     
     print("Video stream connected")
+    if USE_CAMERA_MOTION:
+        threading.Thread(target=camera_motion_listener, daemon=True).start()
     motion_detection_with_face_recognition(cap)
     cap.release()
     
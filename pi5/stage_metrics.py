@@ -0,0 +1,134 @@
+# stage_metrics.py - Время этапов обработки и счётчики: текст Prometheus и JSON-сводка
+import time
+import threading
+from collections import deque
+
+# Границы корзин гистограммы, мс
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+class StageMetrics:
+    def __init__(self, prefix="homepal", buckets=BUCKETS_MS, window=500):
+        self.prefix = prefix
+        self.buckets = buckets
+        self.window = window
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}
+        # Функции, возвращающие {имя: значение} - опрашиваются при каждом запросе
+        self.collectors = []
+        self.started = time.time()
+
+    def _stage(self, name):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = {
+                "buckets": [0] * len(self.buckets),
+                "count": 0,
+                "sum": 0.0,
+                "recent": deque(maxlen=self.window),
+            }
+        return stage
+
+    def observe(self, name, ms):
+        with self.lock:
+            stage = self._stage(name)
+            stage["count"] += 1
+            stage["sum"] += ms
+            stage["recent"].append(ms)
+            for i, bound in enumerate(self.buckets):
+                if ms <= bound:
+                    stage["buckets"][i] += 1
+                    break
+
+    def timer(self, name):
+        return _StageTimer(self, name)
+
+    def inc(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def set_gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def add_collector(self, collect):
+        self.collectors.append(collect)
+
+    def _collected(self):
+        with self.lock:
+            gauges = dict(self.gauges)
+        for collect in self.collectors:
+            try:
+                gauges.update(collect())
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+        return gauges
+
+    @staticmethod
+    def _p(values, q):
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(len(values) * q))]
+
+    def summary(self):
+        with self.lock:
+            stages = {}
+            for name, stage in self.stages.items():
+                recent = sorted(stage["recent"])
+                stages[name] = {
+                    "count": stage["count"],
+                    "avg_ms": round(sum(recent) / len(recent), 2) if recent else 0.0,
+                    "p50_ms": round(self._p(recent, 0.5), 2),
+                    "p95_ms": round(self._p(recent, 0.95), 2),
+                    "p99_ms": round(self._p(recent, 0.99), 2),
+                }
+            counters = dict(self.counters)
+        return {
+            "uptime": round(time.time() - self.started, 1),
+            "stages": stages,
+            "counters": counters,
+            "gauges": self._collected(),
+        }
+
+    def prometheus(self):
+        p = self.prefix
+        lines = [f"# TYPE {p}_stage_seconds histogram"]
+        with self.lock:
+            for name, stage in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, stage["buckets"]):
+                    cumulative += n
+                    lines.append(f'{p}_stage_seconds_bucket{{stage="{name}",le="{bound / 1000:g}"}} {cumulative}')
+                lines.append(f'{p}_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {stage["count"]}')
+                lines.append(f'{p}_stage_seconds_sum{{stage="{name}"}} {stage["sum"] / 1000:.6f}')
+                lines.append(f'{p}_stage_seconds_count{{stage="{name}"}} {stage["count"]}')
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {p}_{name}_total counter")
+                lines.append(f"{p}_{name}_total {value}")
+        typed = set()
+        for name, value in sorted(self._collected().items()):
+            if value is None:
+                continue
+            if isinstance(value, bool):
+                value = int(value)
+            # Имя может нести метки: pose_fps{stream="hall"}
+            base = name.split("{", 1)[0]
+            if base not in typed:
+                typed.add(base)
+                lines.append(f"# TYPE {p}_{base} gauge")
+            lines.append(f"{p}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+class _StageTimer:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, (time.perf_counter() - self.started) * 1000)
+        return False
@@ -0,0 +1,126 @@
+# stage_workers.py - Процессы-обработчики кадров (поза, лица), кадры через frame_ring
+import time
+from collections import deque
+from frame_ring import FrameRingReader
+
+def worker_loop(name, stage, make_handler, ring_name, tasks, results):
+    # make_handler() вызывается уже внутри процесса: модели грузятся один раз
+    handler = make_handler()
+    # Кольцо по умолчанию или своё у каждого потока (context["ring"]),
+    # читатели открываются при первом кадре из кольца
+    readers = {}
+    if ring_name:
+        readers[ring_name] = FrameRingReader(ring_name, wait=30)
+    results.put({"worker": name, "stage": stage, "seq": 0, "ready": True})
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        seq, context = task
+        stream = context.get("stream")
+        started = time.monotonic()
+        ring = context.get("ring", ring_name)
+        reader = readers.get(ring)
+        if reader is None:
+            reader = readers[ring] = FrameRingReader(ring, wait=30)
+        item = reader.read(seq)
+        read_done = time.monotonic()
+        if item is None:
+            results.put({"worker": name, "stage": stage, "stream": stream, "seq": seq, "result": None,
+                         "error": "frame overwritten", "read_ms": 0.0, "process_ms": 0.0})
+            continue
+        _, _, frame = item
+        error = None
+        try:
+            result = handler(frame, context)
+        except Exception as e:
+            print(f"[{name}] Processing error: {e}")
+            result, error = None, str(e)
+        finished = time.monotonic()
+        results.put({
+            "worker": name,
+            "stage": stage,
+            "stream": stream,
+            "seq": seq,
+            "result": result,
+            "error": error,
+            "read_ms": (read_done - started) * 1000,
+            "process_ms": (finished - read_done) * 1000,
+        })
+    for reader in readers.values():
+        reader.close()
+
+class StageWorker:
+    def __init__(self, ctx, stage, make_handler, ring_name, results, index=0):
+        self.stage = stage
+        self.name = f"{stage}-{index}"
+        self.tasks = ctx.Queue()
+        self.process = ctx.Process(
+            target=worker_loop,
+            args=(self.name, stage, make_handler, ring_name, self.tasks, results),
+            name=self.name,
+            daemon=True,
+        )
+        self.ready = False
+        self.busy = False
+        self.current = None
+        self.submitted_at = 0.0
+
+    def start(self):
+        self.process.start()
+        return self
+
+    def submit(self, seq, context=None):
+        self.busy = True
+        self.current = seq
+        self.submitted_at = time.monotonic()
+        self.tasks.put((seq, context or {}))
+
+    def finish(self):
+        self.busy = False
+        self.current = None
+
+    def idle(self):
+        return self.ready and not self.busy
+
+    def stop(self):
+        if self.process.is_alive():
+            self.tasks.put(None)
+            self.process.join(timeout=3)
+        if self.process.is_alive():
+            self.process.terminate()
+
+class StageStats:
+    # Пропускная способность и задержка этапа по скользящему окну
+    def __init__(self, window=200):
+        self.completed = deque(maxlen=window)
+        self.process_ms = deque(maxlen=window)
+        self.latency_ms = deque(maxlen=window)
+        self.total = 0
+
+    def record(self, process_ms, latency_ms):
+        self.completed.append(time.monotonic())
+        self.process_ms.append(process_ms)
+        self.latency_ms.append(latency_ms)
+        self.total += 1
+
+    def fps(self):
+        if len(self.completed) < 2 or self.completed[-1] == self.completed[0]:
+            return 0.0
+        return (len(self.completed) - 1) / (self.completed[-1] - self.completed[0])
+
+    @staticmethod
+    def _p(values, q):
+        if not values:
+            return 0.0
+        values = sorted(values)
+        return values[min(len(values) - 1, int(len(values) * q))]
+
+    def summary(self):
+        return {
+            "total": self.total,
+            "fps": round(self.fps(), 2),
+            "process_ms_p50": round(self._p(self.process_ms, 0.5), 1),
+            "latency_ms_p50": round(self._p(self.latency_ms, 0.5), 1),
+            "latency_ms_p95": round(self._p(self.latency_ms, 0.95), 1),
+        }
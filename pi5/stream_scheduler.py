@@ -0,0 +1,78 @@
+# stream_scheduler.py - Несколько камер: состояние потока и честное деление воркеров между потоками
+import time
+from collections import OrderedDict
+from stage_workers import StageStats
+
+class CameraStream:
+    # Всё, что относится к одной камере: чтение, каскад, падение, лица, статистика
+    def __init__(self, name, grabber, cascade, fall_engine, ring_name):
+        self.name = name
+        self.grabber = grabber
+        self.cascade = cascade
+        self.fall_engine = fall_engine
+        self.ring_name = ring_name
+        self.ring = None
+        self.last_seq = 0
+        self.processed = 0
+        self.skipped = 0
+        self.last_frame_time = time.time()
+        # Время захвата последнего кадра (часы камеры): окна удержания каскада
+        # отсчитываются по тем же часам, что и сам каскад
+        self.last_ts = None
+        self.stalled = False
+        # Кадр, для которого каскад уже сказал «нужна поза», ждёт свободного воркера
+        self.pending = None
+        self.face_pending = False
+        self.face_requested = 0.0
+        self.latest_faces = {"seq": 0, "names": []}
+        self.stats = {"pose": StageStats(), "face": StageStats()}
+        self.pose_level = {"complexity": None, "scale": None, "roi": 0, "runs": 0}
+        # Результаты этапов, сведённые по номеру кадра в кольце потока
+        self.joined = OrderedDict()
+
+    def context(self):
+        return {"stream": self.name, "ring": self.ring_name}
+
+    def poll(self):
+        # Самый свежий кадр без ожидания: (frame, ts) или None
+        seq, frame, ts, skipped = self.grabber.read_latest(self.last_seq, timeout=0)
+        if frame is None:
+            return None
+        self.last_seq = seq
+        self.processed += 1
+        self.skipped += skipped
+        self.last_frame_time = time.time()
+        self.last_ts = ts
+        self.stalled = False
+        return frame, ts, skipped
+
+    def priority(self, now=None):
+        if now is None:
+            now = self.last_ts if self.last_ts is not None else time.time()
+        if self.cascade.person_recent(now):
+            return "person"
+        if now - self.cascade.last_motion <= self.cascade.motion_holdover:
+            return "motion"
+        return "idle"
+
+class FairScheduler:
+    # Шаговое планирование: каждый запуск позы сдвигает «виртуальное время» потока
+    # на 1/вес, выбирается поток с наименьшим временем. Потоки с человеком
+    # или движением получают больше запусков, но никто не голодает
+    def __init__(self, weights):
+        self.weights = weights
+        self.vtime = {}
+        self.clock = 0.0
+        self.picks = {}
+
+    def pick(self, candidates, now=None):
+        if not candidates:
+            return None
+        for stream in candidates:
+            # Поток, долго не просивший позу, не копит «кредит» на будущее
+            self.vtime[stream.name] = max(self.vtime.get(stream.name, 0.0), self.clock)
+        chosen = min(candidates, key=lambda s: (self.vtime[s.name], s.name))
+        self.clock = self.vtime[chosen.name]
+        self.vtime[chosen.name] += 1.0 / self.weights[chosen.priority(now)]
+        self.picks[chosen.name] = self.picks.get(chosen.name, 0) + 1
+        return chosen
@@ -0,0 +1,105 @@
+# avi_writer.py - Сборка MJPEG-AVI из готовых JPEG кадров (без перекодирования)
+import struct
+
+AVIF_HASINDEX = 0x10
+AVIIF_KEYFRAME = 0x10
+
+def _chunk(fourcc, data):
+    pad = b"\0" if len(data) % 2 else b""
+    return fourcc + struct.pack("<I", len(data)) + data + pad
+
+def _list(list_type, data):
+    return b"LIST" + struct.pack("<I", len(data) + 4) + list_type + data
+
+def constant_rate_schedule(timestamps, fps):
+    # Номер кадра для каждого шага постоянной частоты: при редких кадрах
+    # (режим простоя) один и тот же кадр повторяется, пока не придёт следующий
+    if not timestamps:
+        return []
+    step = 1.0 / fps
+    start = timestamps[0]
+    count = int(round((timestamps[-1] - start) / step)) + 1
+    schedule = []
+    current = 0
+    for k in range(count):
+        target = start + k * step
+        while current + 1 < len(timestamps) and timestamps[current + 1] <= target + step / 2:
+            current += 1
+        schedule.append(current)
+    return schedule
+
+def build_mjpeg_avi(jpegs, fps, width, height, timestamps=None):
+    # timestamps (секунды, по возрастанию) - время захвата каждого кадра: клип пишется
+    # с постоянной частотой fps, пропуски заполняются повтором записи индекса на тот же чанк
+    fps = max(fps, 0.1)
+    schedule = (constant_rate_schedule(timestamps, fps) if timestamps is not None
+                else list(range(len(jpegs))))
+    frame_count = len(schedule)
+    max_size = max((len(j) for j in jpegs), default=0)
+    usec_per_frame = int(round(1000000 / fps))
+    # Частота как дробь rate/scale с точностью до тысячных кадра
+    scale, rate = 1000, int(round(fps * 1000))
+
+    avih = struct.pack(
+        "<14I",
+        usec_per_frame,
+        int(max_size * fps),
+        0,
+        AVIF_HASINDEX,
+        frame_count,
+        0,
+        1,
+        max_size,
+        width,
+        height,
+        0, 0, 0, 0,
+    )
+    strh = struct.pack(
+        "<4s4sIHHIIIIIIIIhhhh",
+        b"vids",
+        b"MJPG",
+        0,
+        0,
+        0,
+        0,
+        scale,
+        rate,
+        0,
+        frame_count,
+        max_size,
+        0xFFFFFFFF,
+        0,
+        0, 0, width, height,
+    )
+    strf = struct.pack(
+        "<IiiHH4sIiiII",
+        40,
+        width,
+        height,
+        1,
+        24,
+        b"MJPG",
+        width * height * 3,
+        0,
+        0,
+        0,
+        0,
+    )
+    hdrl = _list(b"hdrl", _chunk(b"avih", avih) +
+                 _list(b"strl", _chunk(b"strh", strh) + _chunk(b"strf", strf)))
+
+    movi_parts = []
+    entries = []
+    # Смещения в idx1 отсчитываются от fourcc 'movi'
+    offset = 4
+    for jpeg in jpegs:
+        chunk = _chunk(b"00dc", jpeg)
+        entries.append(struct.pack("<4sIII", b"00dc", AVIIF_KEYFRAME, offset, len(jpeg)))
+        movi_parts.append(chunk)
+        offset += len(chunk)
+    index = [entries[i] for i in schedule]
+    movi = _list(b"movi", b"".join(movi_parts))
+    idx1 = _chunk(b"idx1", b"".join(index))
+
+    body = b"AVI " + hdrl + movi + idx1
+    return b"RIFF" + struct.pack("<I", len(body)) + body
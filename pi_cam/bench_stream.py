@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# bench_stream.py - Нагрузочный тест стрима cam.py без камеры
+# Пример: python3 bench_stream.py --clients 1 2 4 8 --duration 10
+import os
+import sys
+import time
+import json
+import argparse
+import socket
+import threading
+import http.client
+from werkzeug.serving import make_server
+
+# Синтетическая камера вместо Picamera2; задаётся до импорта cam
+os.environ["CAM_BACKEND"] = "fake"
+
+# Приёмный буфер медленного клиента, байт
+SLOW_CLIENT_RCVBUF = 8 * 1024
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+def thread_cpu_time(thread):
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(thread.ident))
+    except (AttributeError, OSError):
+        return 0.0
+
+class StreamClient(threading.Thread):
+    def __init__(self, host, port, path, duration, delay=0.0):
+        super().__init__(daemon=True)
+        self.host = host
+        self.port = port
+        self.path = path
+        self.duration = duration
+        self.delay = delay
+        self.frames = 0
+        self.bytes = 0
+        self.gaps = []
+        self.dropped = 0
+        self.latencies = []
+        self.error = None
+
+    def run(self):
+        try:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=10)
+            if self.delay:
+                # Медленный клиент - как медленная сеть: кадры копятся у отправителя,
+                # а не в большом приёмном буфере локального сокета
+                conn.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                conn.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SLOW_CLIENT_RCVBUF)
+                conn.sock.settimeout(10)
+                conn.sock.connect((self.host, self.port))
+            conn.request("GET", self.path)
+            resp = conn.getresponse()
+            end = time.monotonic() + self.duration
+            last = None
+            last_seq = 0
+            while time.monotonic() < end:
+                headers = {}
+                line = resp.fp.readline()
+                while line and line.strip() != b"--frame":
+                    line = resp.fp.readline()
+                if not line:
+                    break
+                while True:
+                    line = resp.fp.readline().strip()
+                    if not line:
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                data = resp.fp.read(int(headers["content-length"]))
+                now = time.monotonic()
+                if last is not None:
+                    self.gaps.append(now - last)
+                last = now
+                seq = int(headers.get("x-frame-seq", 0))
+                if last_seq and seq > last_seq + 1:
+                    self.dropped += seq - last_seq - 1
+                last_seq = seq
+                if "x-capture-ts" in headers:
+                    self.latencies.append(time.time() - float(headers["x-capture-ts"]))
+                self.frames += 1
+                self.bytes += len(data)
+                if self.delay:
+                    time.sleep(self.delay)
+            conn.close()
+        except Exception as e:
+            self.error = str(e)
+
+def run_round(cam, port, clients, slow_clients, slow_delay, duration, path):
+    cam.stage_times["encode_ms"].clear()
+    cpu_start = time.process_time()
+    capture_cpu_start = thread_cpu_time(cam.capture_thread)
+    seq_start = cam.latest_frame["seq"]
+    wall_start = time.monotonic()
+    workers = [StreamClient("127.0.0.1", port, path, duration,
+                            slow_delay if i < slow_clients else 0.0)
+               for i in range(clients)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join(duration + 15)
+    wall = time.monotonic() - wall_start
+    cpu = time.process_time() - cpu_start
+    capture_cpu = thread_cpu_time(cam.capture_thread) - capture_cpu_start
+    captured = cam.latest_frame["seq"] - seq_start
+    encode = list(cam.stage_times["encode_ms"])
+    per_client = []
+    for w in workers:
+        gaps_ms = [g * 1000 for g in w.gaps]
+        per_client.append({
+            "fps": round(w.frames / duration, 2),
+            "frames": w.frames,
+            "dropped": w.dropped,
+            "gap_ms_p50": round(percentile(gaps_ms, 50), 1),
+            "gap_ms_p99": round(percentile(gaps_ms, 99), 1),
+            "gap_ms_max": round(max(gaps_ms, default=0.0), 1),
+            "latency_ms_p50": round(percentile(w.latencies, 50) * 1000, 1),
+            "slow": w.delay > 0,
+            "error": w.error,
+        })
+    return {
+        "clients": clients,
+        "slow_clients": slow_clients,
+        "capture_fps": round(captured / wall, 2),
+        "encode_ms_p50": round(percentile(encode, 50), 2),
+        "encode_ms_p99": round(percentile(encode, 99), 2),
+        "process_cpu_pct": round(100 * cpu / wall, 1),
+        "capture_thread_cpu_pct": round(100 * capture_cpu / wall, 1),
+        "per_client": per_client,
+    }
+
+def print_round(result):
+    fast = [c for c in result["per_client"] if not c["slow"]]
+    print(f"clients={result['clients']:<3} capture={result['capture_fps']:>6.1f} fps  "
+          f"encode p50/p99={result['encode_ms_p50']:.1f}/{result['encode_ms_p99']:.1f} ms  "
+          f"cpu={result['process_cpu_pct']:.0f}% (capture thread {result['capture_thread_cpu_pct']:.0f}%)")
+    for i, c in enumerate(result["per_client"]):
+        tag = " slow" if c["slow"] else ""
+        err = f" error={c['error']}" if c["error"] else ""
+        print(f"    client {i}{tag}: {c['fps']:>6.1f} fps  gap p50/p99/max="
+              f"{c['gap_ms_p50']}/{c['gap_ms_p99']}/{c['gap_ms_max']} ms  "
+              f"dropped={c['dropped']} latency p50={c['latency_ms_p50']} ms{err}")
+    if fast:
+        worst = min(c["fps"] for c in fast)
+        print(f"    slowest regular client: {worst:.1f} fps")
+
+def main():
+    parser = argparse.ArgumentParser(description="cam.py streaming benchmark (fake camera)")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--camera-fps", type=float, default=30.0,
+                        help="rate of the synthetic camera, 0 = as fast as possible")
+    parser.add_argument("--slow-clients", type=int, default=0)
+    parser.add_argument("--slow-delay", type=float, default=0.2,
+                        help="seconds a slow client sleeps after each frame")
+    parser.add_argument("--path", default="/video_feed?fps=full")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import cam
+    cam.picam2.fps = args.camera_fps
+
+    server = make_server("127.0.0.1", 0, cam.app, threaded=True)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Fake camera at {args.camera_fps or 'max'} fps, serving on port {port}")
+
+    results = []
+    for clients in args.clients:
+        result = run_round(cam, port, clients, min(args.slow_clients, clients),
+                           args.slow_delay, args.duration, args.path)
+        print_round(result)
+        results.append(result)
+        time.sleep(0.5)
+
+    server.shutdown()
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,99 @@
 # cam.py - Камера стрим (демонстрационная версия)
-from flask import Flask, Response, render_template_string
-from picamera2 import Picamera2, Preview
+from flask import Flask, Response, render_template_string, request, jsonify
 import cv2
+import os
+import atexit
+import socket
 import time
+import threading
+import itertools
+import json
+from collections import deque
+from avi_writer import build_mjpeg_avi
+
+# CAM_BACKEND=fake подставляет синтетическую камеру (тесты без железа)
+CAMERA_BACKEND = os.environ.get("CAM_BACKEND", "picamera2")
+if CAMERA_BACKEND == "fake":
+    from fake_camera import FakePicamera2 as Picamera2
+else:
+    from picamera2 import Picamera2, Preview
+
+# Кольцо сырых кадров в разделяемой памяти для анализа на этой же плате
+# (пустое имя - выключено)
+SHM_NAME = os.environ.get("CAM_SHM_NAME", "")
+SHM_SLOTS = 8
+
+# --- Конфигурация ---
+MAIN_SIZE = (640, 480)
+LORES_SIZE = (320, 240)
+MAIN_QUALITY = 95
+ANALYTICS_QUALITY = 70
+MIN_QUALITY = 10
+MAX_QUALITY = 95
+
+# Детектор движения на стороне камеры (по lores, без декодирования JPEG)
+MOTION_SIZE = (160, 120)
+MOTION_PIXEL_THRESHOLD = 25
+MOTION_MIN_BOX_AREA = 20
+MOTION_KEEPALIVE = 5.0
+
+# Регулятор частоты: без движения камера переходит на редкие кадры
+IDLE_FPS = 2.0
+IDLE_MOTION_THRESHOLD = 0.002
+IDLE_AFTER = 10.0
+GOVERNOR_HISTORY = 50
+
+# Очередь отправки на клиента - примерно столько кадров: иначе буфер ядра
+# принимает всё, и медленный клиент получает кадры с растущей задержкой
+SEND_BUFFER_FRAMES = 2
+MIN_SEND_BUFFER = 16 * 1024
+
+# Кольцевой буфер уже закодированных кадров (предзапись для клипов)
+RING_SECONDS = 20.0
+RING_MAX_FRAMES = 600
+CLIP_MAX_FUTURE = 60.0
+# Клип пишется с постоянной частотой - не выше этой
+CLIP_MAX_FPS = 30.0
+
+# Профили: main - для людей (цвет, полное разрешение),
+# analytics - серый lores для детекторов движения
+PROFILES = {
+    "main": {"size": MAIN_SIZE, "quality": MAIN_QUALITY},
+    "analytics": {"size": LORES_SIZE, "quality": ANALYTICS_QUALITY},
+}
 
 app = Flask(__name__)
 
 # Camera init
 picam2 = Picamera2()
-video_config = picam2.create_video_configuration(main={"size": (640, 480), "format": "RGB888"})
+video_config = picam2.create_video_configuration(
+    main={"size": MAIN_SIZE, "format": "RGB888"},
+    lores={"size": LORES_SIZE, "format": "YUV420"}
+)
 picam2.configure(video_config)
 picam2.start()
 time.sleep(2)
 
+shm_writer = None
+if SHM_NAME:
+    # Формат кольца общий с читателями на Pi5 (копия модуля - pi_cam/frame_ring.py)
+    from frame_ring import FrameRingWriter
+    shm_writer = FrameRingWriter(SHM_NAME, (MAIN_SIZE[1], MAIN_SIZE[0], 3), slots=SHM_SLOTS)
+    print(f"Raw frames published to shared memory: {SHM_NAME}")
+
+def close_shm_writer():
+    # Сегмент в /dev/shm переживает процесс: без unlink он занимал бы память
+    # до следующего запуска камеры или перезагрузки
+    global shm_writer
+    writer, shm_writer = shm_writer, None
+    if writer is not None:
+        try:
+            writer.close(unlink=True)
+        except FileNotFoundError:
+            pass
+
+atexit.register(close_shm_writer)
+
 PAGE = """
 <html>
 <head>
@@ -25,15 +106,376 @@ PAGE = """
 </html>
 """
 
-def generate_frames():
+# --- Общий кадр: один захват и одно кодирование на всех клиентов ---
+frame_cond = threading.Condition()
+latest_frame = {"seq": 0, "jpeg": None, "ts": 0.0, "mono": 0.0, "bgr": None, "gray": None, "motion": None}
+
+# Последние RING_SECONDS секунд: (seq, wall, mono, jpeg), защищено frame_cond
+frame_ring = deque(maxlen=RING_MAX_FRAMES)
+
+# Кэш кодирования нестандартных вариантов: ключ -> (seq, jpeg)
+variant_cache = {}
+variant_locks = {}
+variant_locks_guard = threading.Lock()
+
+def compute_motion(gray, prev_small):
+    small = cv2.resize(gray, MOTION_SIZE, interpolation=cv2.INTER_AREA)
+    small = cv2.GaussianBlur(small, (5, 5), 0)
+    if prev_small is None:
+        return small, 0.0, []
+    diff = cv2.absdiff(prev_small, small)
+    _, mask = cv2.threshold(diff, MOTION_PIXEL_THRESHOLD, 255, cv2.THRESH_BINARY)
+    score = cv2.countNonZero(mask) / mask.size
+    boxes = []
+    if score > 0:
+        mask = cv2.dilate(mask, None, iterations=1)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        sx = MAIN_SIZE[0] / MOTION_SIZE[0]
+        sy = MAIN_SIZE[1] / MOTION_SIZE[1]
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if w * h < MOTION_MIN_BOX_AREA:
+                continue
+            # Координаты в пикселях основного потока
+            boxes.append([round(x * sx), round(y * sy), round(w * sx), round(h * sy)])
+    return small, score, boxes
+
+# --- Регулятор частоты кадров ---
+governor_lock = threading.Lock()
+governor_wake = threading.Event()
+governor = {
+    "mode": "full",
+    "capture_times": deque(maxlen=30),
+    "full_clients": 0,
+    "last_motion": time.monotonic(),
+    "transitions": deque(maxlen=GOVERNOR_HISTORY),
+}
+
+def set_governor_mode(mode, reason):
+    if governor["mode"] == mode:
+        return
+    governor["mode"] = mode
+    governor["transitions"].append({"ts": time.time(), "mode": mode, "reason": reason})
+    print(f"Frame rate -> {mode} ({reason})")
+
+def update_governor(motion_score):
+    now = time.monotonic()
+    with governor_lock:
+        if motion_score >= IDLE_MOTION_THRESHOLD:
+            governor["last_motion"] = now
+            set_governor_mode("full", f"motion {motion_score:.4f}")
+        elif governor["full_clients"] > 0:
+            set_governor_mode("full", "client requested fps=full")
+        elif now - governor["last_motion"] >= IDLE_AFTER:
+            set_governor_mode("idle", f"no motion for {IDLE_AFTER:.0f}s")
+        return governor["mode"]
+
+def request_full_rate(delta):
+    with governor_lock:
+        governor["full_clients"] = max(0, governor["full_clients"] + delta)
+        if delta > 0:
+            set_governor_mode("full", "client requested fps=full")
+    if delta > 0:
+        governor_wake.set()
+
+# Время этапов цикла захвата, мс (последние кадры)
+stage_times = {
+    "convert_ms": deque(maxlen=300),
+    "motion_ms": deque(maxlen=300),
+    "encode_ms": deque(maxlen=300),
+}
+
+def stage_summary():
+    summary = {}
+    for name, values in stage_times.items():
+        values = sorted(values)
+        if values:
+            summary[name] = {
+                "avg": round(sum(values) / len(values), 2),
+                "p50": round(values[len(values) // 2], 2),
+                "p99": round(values[min(len(values) - 1, int(len(values) * 0.99))], 2),
+            }
+    return summary
+
+def measured_fps(window=3.0):
+    now = time.monotonic()
+    times = [t for t in list(governor["capture_times"]) if now - t <= window]
+    if len(times) < 2 or times[-1] == times[0]:
+        return 0.0
+    return round((len(times) - 1) / (times[-1] - times[0]), 2)
+
+def capture_loop():
+    lores_w, lores_h = LORES_SIZE
+    prev_small = None
     while True:
-        frame = picam2.capture_array()
-        frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-        ret, buffer = cv2.imencode('.jpg', frame)
+        started = time.monotonic()
+        governor["capture_times"].append(started)
+        try:
+            (main, lores), metadata = picam2.capture_arrays(["main", "lores"])
+            captured_wall = time.time()
+            captured_mono = time.monotonic()
+            frame = cv2.cvtColor(main, cv2.COLOR_RGB2BGR)
+            if shm_writer is not None:
+                shm_writer.write(frame, captured_wall, captured_mono)
+            t_converted = time.monotonic()
+            # Y-плоскость YUV420 - готовый серый кадр без преобразования
+            gray = lores[:lores_h, :lores_w]
+            prev_small, motion_score, boxes = compute_motion(gray, prev_small)
+            t_motion = time.monotonic()
+            ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, MAIN_QUALITY])
+            t_encoded = time.monotonic()
+            stage_times["convert_ms"].append((t_converted - captured_mono) * 1000)
+            stage_times["motion_ms"].append((t_motion - t_converted) * 1000)
+            stage_times["encode_ms"].append((t_encoded - t_motion) * 1000)
+        except Exception as e:
+            print(f"Capture error: {e}")
+            time.sleep(0.5)
+            continue
+        if not ret:
+            continue
+        with frame_cond:
+            latest_frame["seq"] += 1
+            latest_frame["jpeg"] = buffer.tobytes()
+            latest_frame["ts"] = captured_wall
+            latest_frame["mono"] = captured_mono
+            latest_frame["bgr"] = frame
+            latest_frame["gray"] = gray
+            latest_frame["motion"] = {
+                "seq": latest_frame["seq"],
+                "ts": latest_frame["ts"],
+                "motion_score": round(motion_score, 4),
+                "boxes": boxes,
+            }
+            frame_ring.append((latest_frame["seq"], captured_wall, captured_mono, latest_frame["jpeg"]))
+            while frame_ring and captured_mono - frame_ring[0][2] > RING_SECONDS:
+                frame_ring.popleft()
+            frame_cond.notify_all()
+        if update_governor(motion_score) == "idle":
+            # Ждём до следующего редкого кадра; клиент с fps=full будит сразу
+            delay = 1.0 / IDLE_FPS - (time.monotonic() - started)
+            if delay > 0 and governor_wake.wait(delay):
+                governor_wake.clear()
+
+def wait_for_frame(last_seq, timeout=5.0):
+    with frame_cond:
+        frame_cond.wait_for(lambda: latest_frame["seq"] > last_seq, timeout=timeout)
+        return latest_frame["seq"], latest_frame["jpeg"], latest_frame["ts"]
+
+def wait_for_motion(last_seq, timeout=5.0):
+    # Номер кадра и его событие движения читаются под одной блокировкой
+    with frame_cond:
+        frame_cond.wait_for(lambda: latest_frame["seq"] > last_seq, timeout=timeout)
+        return latest_frame["seq"], latest_frame["motion"]
+
+def parse_variant(args):
+    profile = args.get("profile", "main")
+    if profile not in PROFILES:
+        raise ValueError(f"unknown profile: {profile}")
+    native_w, native_h = PROFILES[profile]["size"]
+    width = args.get("width", type=int)
+    height = args.get("height", type=int)
+    if width and not height:
+        height = round(width * native_h / native_w)
+    elif height and not width:
+        width = round(height * native_w / native_h)
+    width = min(width or native_w, native_w)
+    height = min(height or native_h, native_h)
+    if width < 16 or height < 16:
+        raise ValueError("size too small")
+    quality = args.get("quality", default=PROFILES[profile]["quality"], type=int)
+    quality = max(MIN_QUALITY, min(MAX_QUALITY, quality))
+    return (profile, width, height, quality)
+
+DEFAULT_VARIANT = ("main", MAIN_SIZE[0], MAIN_SIZE[1], MAIN_QUALITY)
+
+def get_variant_lock(key):
+    with variant_locks_guard:
+        return variant_locks.setdefault(key, threading.Lock())
+
+def encode_variant(key):
+    # Каждый вариант кодируется не более одного раза на кадр,
+    # сколько бы клиентов его ни запрашивало
+    with frame_cond:
+        seq = latest_frame["seq"]
+        ts = (latest_frame["ts"], latest_frame["mono"])
+        if key == DEFAULT_VARIANT:
+            return seq, latest_frame["jpeg"], ts
+        source = latest_frame["gray"] if key[0] == "analytics" else latest_frame["bgr"]
+    if source is None:
+        return seq, None, ts
+    with get_variant_lock(key):
+        cached = variant_cache.get(key)
+        if cached and cached[0] == seq:
+            return seq, cached[1], ts
+        profile, width, height, quality = key
+        if (width, height) != (source.shape[1], source.shape[0]):
+            source = cv2.resize(source, (width, height), interpolation=cv2.INTER_AREA)
+        ret, buffer = cv2.imencode('.jpg', source, [cv2.IMWRITE_JPEG_QUALITY, quality])
         if not ret:
+            return seq, None, ts
+        jpeg = buffer.tobytes()
+        variant_cache[key] = (seq, jpeg)
+    # Варианты, которые давно никто не запрашивал, не держим в памяти - ни кадр,
+    # ни его блокировку (иначе каждый новый width/height/quality оставлял бы по Lock)
+    with variant_locks_guard:
+        for stale in [k for k, (s, _) in list(variant_cache.items()) if s < seq - 100]:
+            variant_cache.pop(stale, None)
+        # Блокировка без кадра в кэше (устарел или не закодировался) тоже лишняя,
+        # если её сейчас никто не держит
+        for stale in [k for k, lock in variant_locks.items()
+                      if k not in variant_cache and not lock.locked()]:
+            del variant_locks[stale]
+    return seq, jpeg, ts
+
+# --- Клиенты: последний кадр побеждает, статистика по каждому ---
+clients_lock = threading.Lock()
+clients = {}
+client_ids = itertools.count(1)
+
+def register_client(remote_addr, variant, full_rate=False):
+    client = {
+        "id": next(client_ids),
+        "remote": remote_addr,
+        "variant": "{}:{}x{}:q{}".format(*variant),
+        "connected_at": time.time(),
+        "sent": 0,
+        "dropped": 0,
+        "lag_ms": 0.0,
+        "max_lag_ms": 0.0,
+        "send_ms": 0.0,
+        "full_rate": full_rate,
+    }
+    with clients_lock:
+        clients[client["id"]] = client
+    if full_rate:
+        request_full_rate(1)
+    print(f"Client {client['id']} connected: {remote_addr} ({client['variant']})")
+    return client
+
+def unregister_client(client):
+    with clients_lock:
+        if clients.pop(client["id"], None) is None:
+            return
+    if client["full_rate"]:
+        request_full_rate(-1)
+    print(f"Client {client['id']} disconnected: sent={client['sent']} dropped={client['dropped']}")
+
+def frame_part(seq, jpeg, ts):
+    wall, mono = ts
+    # Content-Length позволяет читать поток без поиска границы
+    headers = (f"--frame\r\n"
+               f"Content-Type: image/jpeg\r\n"
+               f"Content-Length: {len(jpeg)}\r\n"
+               f"X-Frame-Seq: {seq}\r\n"
+               f"X-Capture-Ts: {wall:.6f}\r\n"
+               f"X-Capture-Monotonic: {mono:.6f}\r\n\r\n")
+    return headers.encode() + jpeg + b'\r\n'
+
+def limit_send_buffer(sock):
+    # Маленький SO_SNDBUF: yield блокируется, пока клиент не заберёт кадр,
+    # и кадры, вышедшие за это время, действительно пропускаются
+    if sock is None:
+        return
+    frame_size = len(latest_frame["jpeg"] or b"") or MAIN_SIZE[0] * MAIN_SIZE[1] // 8
+    try:
+        # Linux удваивает заданное значение (служебные данные) - задаём половину
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF,
+                        max(MIN_SEND_BUFFER, SEND_BUFFER_FRAMES * frame_size) // 2)
+    except OSError as e:
+        print(f"Cannot limit send buffer: {e}")
+
+def generate_frames(client, variant=DEFAULT_VARIANT):
+    last_seq = 0
+    try:
+        while True:
+            seq, _, _ = wait_for_frame(last_seq)
+            if seq == last_seq:
+                continue
+            seq, jpeg, ts = encode_variant(variant)
+            if jpeg is None:
+                continue
+            # Кадры, вышедшие пока клиент был занят, не ставятся в очередь
+            if last_seq:
+                client["dropped"] += seq - last_seq - 1
+            last_seq = seq
+            send_start = time.time()
+            yield frame_part(seq, jpeg, ts)
+            # Генератор продолжается после записи кадра в сокет: задержка - от захвата до отправки
+            sent_at = time.time()
+            lag_ms = (sent_at - ts[0]) * 1000
+            client["lag_ms"] = round(lag_ms, 1)
+            client["max_lag_ms"] = round(max(client["max_lag_ms"], lag_ms), 1)
+            client["send_ms"] = round((sent_at - send_start) * 1000, 1)
+            client["sent"] += 1
+    finally:
+        unregister_client(client)
+
+def generate_motion_events(min_score=0.0, fmt="sse"):
+    last_seq = 0
+    last_sent = time.time()
+    while True:
+        seq, motion = wait_for_motion(last_seq, timeout=MOTION_KEEPALIVE)
+        if seq != last_seq and motion is not None and motion["motion_score"] >= min_score:
+            last_seq = seq
+            last_sent = time.time()
+            payload = json.dumps(motion)
+            if fmt == "jsonl":
+                yield payload + "\n"
+            else:
+                yield f"data: {payload}\n\n"
+            continue
+        last_seq = seq
+        # Keepalive, чтобы клиент отличал тишину от обрыва соединения
+        if time.time() - last_sent >= MOTION_KEEPALIVE:
+            last_sent = time.time()
+            yield "\n" if fmt == "jsonl" else ": keepalive\n\n"
+
+def parse_offset(value, default):
+    if value is None or value == "":
+        return default
+    return float(value)
+
+def collect_clip(start_wall, end_wall):
+    # Прошлое берём из буфера, будущее дожидаемся по мере захвата
+    with frame_cond:
+        frames = [f for f in frame_ring if start_wall <= f[1] <= end_wall]
+        last_seq = frame_ring[-1][0] if frame_ring else 0
+    while time.time() < end_wall:
+        seq, _, _ = wait_for_frame(last_seq, timeout=min(1.0, max(0.01, end_wall - time.time())))
+        if seq == last_seq:
+            continue
+        with frame_cond:
+            frames.extend(f for f in frame_ring if f[0] > last_seq and start_wall <= f[1] <= end_wall)
+            last_seq = frame_ring[-1][0] if frame_ring else seq
+    return frames
+
+def clip_fps(frames):
+    # Частота полного режима: по коротким интервалам, а не средняя по клипу -
+    # в кольце вперемешку редкие кадры простоя и кадры при движении
+    intervals = sorted(b[2] - a[2] for a, b in zip(frames, frames[1:]) if b[2] > a[2])
+    if not intervals:
+        return 1.0
+    fast = intervals[len(intervals) // 10]
+    return min(CLIP_MAX_FPS, 1.0 / fast)
+
+def generate_clip_parts(start_wall, end_wall):
+    with frame_cond:
+        past = [f for f in frame_ring if start_wall <= f[1] <= end_wall]
+        last_seq = frame_ring[-1][0] if frame_ring else 0
+    for seq, wall, mono, jpeg in past:
+        yield frame_part(seq, jpeg, (wall, mono))
+    while time.time() < end_wall:
+        seq, _, _ = wait_for_frame(last_seq, timeout=min(1.0, max(0.01, end_wall - time.time())))
+        if seq == last_seq:
             continue
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
+        with frame_cond:
+            fresh = [f for f in frame_ring if f[0] > last_seq and start_wall <= f[1] <= end_wall]
+            last_seq = frame_ring[-1][0] if frame_ring else seq
+        for seq, wall, mono, jpeg in fresh:
+            yield frame_part(seq, jpeg, (wall, mono))
+
+capture_thread = threading.Thread(target=capture_loop, daemon=True)
+capture_thread.start()
 
 @app.route('/')
 def index():
@@ -41,8 +483,112 @@ def index():
 
 @app.route('/video_feed')
 def video_feed():
-    return Response(generate_frames(),
-                    mimetype='multipart/x-mixed-replace; boundary=frame')
+    try:
+        variant = parse_variant(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    full_rate = request.args.get("fps") == "full"
+    client = register_client(request.remote_addr, variant, full_rate)
+    limit_send_buffer(request.environ.get("werkzeug.socket"))
+    response = Response(generate_frames(client, variant),
+                        mimetype='multipart/x-mixed-replace; boundary=frame')
+    response.call_on_close(lambda: unregister_client(client))
+    return response
+
+@app.route('/snapshot.jpg')
+def snapshot():
+    try:
+        variant = parse_variant(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if latest_frame["seq"] == 0:
+        wait_for_frame(0)
+    seq, jpeg, ts = encode_variant(variant)
+    if jpeg is None:
+        return jsonify({"error": "no frame available"}), 503
+    # ETag по номеру кадра: опрашивающий клиент получает 304, пока кадр тот же
+    etag = "{}-{}-{}x{}-q{}".format(seq, *variant)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(jpeg, mimetype='image/jpeg')
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Frame-Seq"] = str(seq)
+    response.headers["X-Capture-Ts"] = f"{ts[0]:.6f}"
+    response.headers["X-Capture-Monotonic"] = f"{ts[1]:.6f}"
+    return response
+
+@app.route('/motion')
+def motion():
+    min_score = request.args.get("min_score", default=0.0, type=float)
+    fmt = request.args.get("format", "sse")
+    if fmt not in ("sse", "jsonl"):
+        return jsonify({"error": f"unknown format: {fmt}"}), 400
+    mimetype = "application/x-ndjson" if fmt == "jsonl" else "text/event-stream"
+    response = Response(generate_motion_events(min_score, fmt), mimetype=mimetype)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+@app.route('/clip')
+def clip():
+    try:
+        offset_from = parse_offset(request.args.get("from"), -10.0)
+        offset_to = parse_offset(request.args.get("to"), 0.0)
+    except ValueError:
+        return jsonify({"error": "from/to must be seconds relative to now"}), 400
+    offset_from = max(offset_from, -RING_SECONDS)
+    offset_to = min(offset_to, CLIP_MAX_FUTURE)
+    if offset_to <= offset_from:
+        return jsonify({"error": "empty time range"}), 400
+    fmt = request.args.get("format", "avi")
+    now = time.time()
+    start_wall, end_wall = now + offset_from, now + offset_to
+    name = time.strftime("clip_%Y%m%d_%H%M%S", time.localtime(now))
+    if fmt == "mjpeg":
+        response = Response(generate_clip_parts(start_wall, end_wall),
+                            mimetype='multipart/x-mixed-replace; boundary=frame')
+        response.headers["Content-Disposition"] = f"attachment; filename={name}.mjpeg"
+        return response
+    if fmt != "avi":
+        return jsonify({"error": f"unknown format: {fmt}"}), 400
+    frames = collect_clip(start_wall, end_wall)
+    if not frames:
+        return jsonify({"error": "no frames in range"}), 404
+    avi = build_mjpeg_avi([f[3] for f in frames], clip_fps(frames), MAIN_SIZE[0], MAIN_SIZE[1],
+                          timestamps=[f[2] for f in frames])
+    response = Response(avi, mimetype='video/x-msvideo')
+    response.headers["Content-Disposition"] = f"attachment; filename={name}.avi"
+    response.headers["X-Clip-Frames"] = str(len(frames))
+    response.headers["X-Clip-First-Seq"] = str(frames[0][0])
+    return response
+
+@app.route('/stats')
+def stats():
+    with clients_lock:
+        client_stats = [dict(c) for c in clients.values()]
+    with governor_lock:
+        governor_stats = {
+            "mode": governor["mode"],
+            "fps": measured_fps(),
+            "idle_fps": IDLE_FPS,
+            "full_clients": governor["full_clients"],
+            "seconds_since_motion": round(time.monotonic() - governor["last_motion"], 1),
+            "transitions": list(governor["transitions"]),
+        }
+    with frame_cond:
+        ring_stats = {
+            "frames": len(frame_ring),
+            "seconds": round(frame_ring[-1][2] - frame_ring[0][2], 1) if frame_ring else 0.0,
+            "bytes": sum(len(f[3]) for f in frame_ring),
+        }
+    return jsonify({
+        "seq": latest_frame["seq"],
+        "ring": ring_stats,
+        "stages": stage_summary(),
+        "clients": client_stats,
+        "governor": governor_stats,
+    })
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8000, threaded=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=8000, threaded=True)
@@ -0,0 +1,67 @@
+# fake_camera.py - Синтетическая камера вместо Picamera2 (для тестов и бенчмарков)
+import time
+import numpy as np
+
+class FakePicamera2:
+    def __init__(self, fps=30.0, motion=True):
+        self.fps = fps
+        self.motion = motion
+        self.config = None
+        self.started = False
+        self.frame_index = 0
+        self.next_frame_time = 0.0
+
+    def create_video_configuration(self, main=None, lores=None, **kwargs):
+        config = {"main": dict(main or {"size": (640, 480), "format": "RGB888"})}
+        if lores:
+            config["lores"] = dict(lores)
+        return config
+
+    def configure(self, config):
+        self.config = config
+
+    def start(self):
+        self.started = True
+        self.next_frame_time = time.monotonic()
+
+    def stop(self):
+        self.started = False
+
+    def close(self):
+        self.stop()
+
+    def _wait_frame_interval(self):
+        if self.fps:
+            now = time.monotonic()
+            if self.next_frame_time > now:
+                time.sleep(self.next_frame_time - now)
+            self.next_frame_time = max(self.next_frame_time, now) + 1.0 / self.fps
+        self.frame_index += 1
+
+    def _render(self, name):
+        stream = self.config[name]
+        width, height = stream["size"]
+        # Движущаяся полоса на градиентном фоне
+        offset = (self.frame_index * 4) % width if self.motion else 0
+        row = ((np.arange(width) + offset) % 256).astype(np.uint8)
+        if stream.get("format") == "YUV420":
+            frame = np.empty((height * 3 // 2, width), dtype=np.uint8)
+            frame[:height] = row
+            frame[height:] = 128
+            return frame
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[:] = row[None, :, None]
+        frame[height // 3:height // 2, :, 1] = 200
+        bar = (self.frame_index * 8) % width if self.motion else width // 2
+        frame[:, bar:bar + 16] = 255
+        return frame
+
+    def capture_array(self, name="main"):
+        self._wait_frame_interval()
+        return self._render(name)
+
+    def capture_arrays(self, names=("main",)):
+        self._wait_frame_interval()
+        arrays = [self._render(name) for name in names]
+        metadata = {"SensorTimestamp": int(time.monotonic() * 1e9)}
+        return arrays, metadata